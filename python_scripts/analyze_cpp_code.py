@@ -1,14 +1,1099 @@
 #!/usr/bin/env python3
+import argparse
+import bisect
+import hashlib
+import json
+import mmap
 import os
 import re
+import shlex
 import subprocess
-import sys
+import tempfile
+import threading
+import time
+from array import array
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+from pathlib import Path
 from typing import Any
 
+from inotify_watch import (
+    IN_CLOSE_WRITE,
+    IN_DELETE,
+    IN_ISDIR,
+    IN_MOVED_FROM,
+    IN_MOVED_TO,
+    IN_Q_OVERFLOW,
+    Event,
+    Inotify,
+)
+from tree_walk import argv_batches, file_digest, walk_files
+
+
+class AnalysisCache:
+    """Persistent per-file report cache keyed by content hash.
+
+    Entries are only valid for the ``salt`` they were written with, which
+    covers the analyzer rule set and the clang-tidy version.
+    """
+
+    def __init__(self, cache_path: str, salt: str, max_entries: int = 50000) -> None:
+        self.cache_path = cache_path
+        self.salt = salt
+        self.max_entries = max_entries
+        self.entries: dict[str, dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.cache_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if data.get("salt") == self.salt:
+            self.entries = data.get("entries", {})
+            for entry in self.entries.values():
+                report = entry["report"]
+                report["findings"] = Findings.from_dict(report["findings"])
+
+    def save(self) -> None:
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {"salt": self.salt, "entries": self.entries},
+                f,
+                default=Findings.to_dict,
+            )
+        os.replace(tmp_path, self.cache_path)
+
+    def get(self, file_path: str) -> dict[str, Any] | None:
+        entry = self.entries.get(file_path)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        try:
+            stat = os.stat(file_path)
+            # Unchanged size and mtime: trust the stored digest without reading
+            if (stat.st_size, stat.st_mtime_ns) != (entry["size"], entry["mtime"]):
+                if file_digest(file_path) != entry["digest"]:
+                    self.misses += 1
+                    return None
+                entry["size"], entry["mtime"] = stat.st_size, stat.st_mtime_ns
+        except OSError:
+            self.misses += 1
+            return None
+
+        entry["used"] = datetime.now().timestamp()
+        self.hits += 1
+        return entry["report"]
+
+    def put(self, file_path: str, report: dict[str, Any]) -> None:
+        # Errors may be transient (missing tool, timeout), never cache them
+        if report.get("error"):
+            return
+
+        try:
+            stat = os.stat(file_path)
+            digest = file_digest(file_path)
+        except OSError:
+            return
+
+        self.entries[file_path] = {
+            "digest": digest,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "used": datetime.now().timestamp(),
+            "report": report,
+        }
+
+    def prune(self, live_paths: set[str]) -> None:
+        """Drop entries for deleted files and cap the cache size."""
+        self.entries = {
+            path: entry for path, entry in self.entries.items() if path in live_paths
+        }
+        if len(self.entries) > self.max_entries:
+            newest = sorted(
+                self.entries.items(), key=lambda item: item[1]["used"], reverse=True
+            )
+            self.entries = dict(newest[: self.max_entries])
+
+
+def newline_offsets(buffer: bytes | mmap.mmap) -> array:
+    """Offsets of every newline; line ``n`` ends at ``offsets[n - 1]``."""
+    return array("q", [match.start() for match in re.finditer(b"\n", buffer)])
+
+
+def run_command(
+    command: list[str], timeout: float | None = None
+) -> tuple[subprocess.CompletedProcess, float]:
+    """Run a command like ``subprocess.run(capture_output=True, text=True)``.
+
+    Also returns the CPU seconds used by the child. The child is reaped with
+    ``os.wait4`` so the figure stays exact while other threads run
+    subprocesses too.
+    """
+    with tempfile.TemporaryFile() as stdout, tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(command, stdout=stdout, stderr=stderr)
+        timed_out = threading.Event()
+
+        def kill() -> None:
+            timed_out.set()
+            process.kill()
+
+        timer = threading.Timer(timeout, kill) if timeout else None
+        if timer:
+            timer.start()
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+        finally:
+            if timer:
+                timer.cancel()
+        process.returncode = os.waitstatus_to_exitcode(status)
+        if timed_out.is_set():
+            raise subprocess.TimeoutExpired(command, timeout)
+
+        stdout.seek(0)
+        stderr.seek(0)
+        result = subprocess.CompletedProcess(
+            command,
+            process.returncode,
+            stdout.read().decode("utf-8", "replace"),
+            stderr.read().decode("utf-8", "replace"),
+        )
+    return result, usage.ru_utime + usage.ru_stime
+
+
+class Profiler:
+    """Collects wall time, CPU time, subprocess spawns and bytes read per
+    phase per file.
+
+    CPU time covers the current thread plus the subprocesses it waited for.
+    Disabled profilers record nothing.
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.records: list[dict[str, Any]] = []
+        # Thread ident -> record of the phase running in that thread
+        self._active: dict[int, dict[str, Any]] = {}
+
+    @contextmanager
+    def phase(self, file_path: str, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+
+        record = {
+            "file": file_path,
+            "phase": name,
+            "wall": 0.0,
+            "cpu": 0.0,
+            "spawns": 0,
+            "bytes_read": 0,
+        }
+        ident = threading.get_ident()
+        self._active[ident] = record
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            record["wall"] += time.perf_counter() - wall
+            record["cpu"] += time.thread_time() - cpu
+            del self._active[ident]
+            self.records.append(record)
+
+    def add(self, spawns: int = 0, cpu: float = 0.0, bytes_read: int = 0) -> None:
+        """Account subprocess and I/O work to the phase of this thread."""
+        record = self._active.get(threading.get_ident())
+        if record is not None:
+            record["spawns"] += spawns
+            record["cpu"] += cpu
+            record["bytes_read"] += bytes_read
+
+    def drain(self) -> list[dict[str, Any]]:
+        records, self.records = self.records, []
+        return records
+
+    def merge(self, records: list[dict[str, Any]]) -> None:
+        self.records.extend(records)
+
+    def phase_totals(self) -> dict[str, dict[str, float]]:
+        totals: dict[str, dict[str, float]] = {}
+        for record in self.records:
+            total = totals.setdefault(
+                record["phase"],
+                {"wall": 0.0, "cpu": 0.0, "spawns": 0, "bytes_read": 0, "files": 0},
+            )
+            for key in ("wall", "cpu", "spawns", "bytes_read"):
+                total[key] += record[key]
+            total["files"] += 1
+        return totals
+
+    def file_totals(self) -> dict[str, float]:
+        totals: dict[str, float] = {}
+        for record in self.records:
+            totals[record["file"]] = totals.get(record["file"], 0.0) + record["wall"]
+        return totals
+
+    def write(self, output_file: str) -> None:
+        with open(output_file, "w") as f:
+            json.dump(
+                {"phases": self.phase_totals(), "records": self.records}, f, indent=2
+            )
+        print(f"\033[1;32mGenerated timings: {output_file}\033[0m")  # Green
+
+    def print_summary(self, top: int = 10) -> None:
+        print("\033[1;36mProfile by phase\033[0m")  # Cyan
+        print(
+            f"{'Phase':<12} {'Files':>7} {'Wall (s)':>10} {'CPU (s)':>10} "
+            f"{'Spawns':>7} {'Read (MB)':>10}"
+        )
+        phases = sorted(
+            self.phase_totals().items(), key=lambda item: item[1]["wall"], reverse=True
+        )
+        for name, total in phases:
+            print(
+                f"{name:<12} {total['files']:>7} {total['wall']:>10.3f} "
+                f"{total['cpu']:>10.3f} {total['spawns']:>7} "
+                f"{total['bytes_read'] / 1048576:>10.2f}"
+            )
+
+        print(f"\033[1;36mSlowest {top} files\033[0m")  # Cyan
+        files = sorted(self.file_totals().items(), key=lambda item: item[1])
+        for file_path, wall in reversed(files[-top:]):
+            print(f"{wall:>10.3f}s  {file_path}")
+
+        print(f"\033[1;36mSlowest {top} file phases\033[0m")  # Cyan
+        records = sorted(self.records, key=lambda record: record["wall"])
+        for record in reversed(records[-top:]):
+            print(
+                f"{record['wall']:>10.3f}s  {record['cpu']:>8.3f}s cpu  "
+                f"{record['phase']:<12} {record['file']}"
+            )
+
+
+class Findings:
+    """Compact findings of one file.
+
+    Every finding is a rule index into the analyzer's ``RuleEngine``, the
+    index of the keyword that fired within the rule, a line and a column,
+    stored in parallel typed arrays. Once a rule has ``cap`` findings
+    further ones are only counted. Messages are rendered at report time
+    by ``CppAnalyzer.render_report``.
+    """
+
+    __slots__ = ("cap", "columns", "counts", "keywords", "lines", "rules")
+
+    def __init__(self, cap: int = 1000) -> None:
+        self.cap = cap
+        self.rules = array("H")
+        self.keywords = array("B")
+        self.lines = array("I")
+        self.columns = array("I")
+        self.counts: dict[int, int] = {}  # rule index -> findings incl. capped
+
+    def add(self, rule: int, line: int, column: int, keyword: int = 0) -> None:
+        count = self.counts.get(rule, 0)
+        self.counts[rule] = count + 1
+        if count < self.cap:
+            self.rules.append(rule)
+            self.keywords.append(keyword)
+            self.lines.append(line)
+            self.columns.append(column)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def __iter__(self) -> Iterator[tuple[int, int, int, int]]:
+        """Yield ``(rule, keyword, line, column)`` in the order found."""
+        return zip(self.rules, self.keywords, self.lines, self.columns)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "cap": self.cap,
+            "rules": self.rules.tolist(),
+            "keywords": self.keywords.tolist(),
+            "lines": self.lines.tolist(),
+            "columns": self.columns.tolist(),
+            "counts": list(self.counts.items()),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "Findings":
+        findings = cls(data["cap"])
+        findings.rules.extend(data["rules"])
+        findings.keywords.extend(data["keywords"])
+        findings.lines.extend(data["lines"])
+        findings.columns.extend(data["columns"])
+        findings.counts = dict(data["counts"])
+        return findings
+
+
+class ScanRule:
+    """A keyword-triggered check applied to every scanned line.
+
+    ``message`` is a format string receiving ``line_number``, ``line`` and
+    ``keyword``; rendered messages are listed in the report under
+    ``category``. Rules without keywords are never fired by the engine and
+    are recorded by the analyzer itself.
+    """
+
+    def __init__(
+        self,
+        rule_id: str,
+        category: str,
+        keywords: tuple[str, ...],
+        message: str,
+        word_boundary: bool = True,
+    ) -> None:
+        self.rule_id = rule_id
+        self.category = category
+        self.keywords = keywords
+        self.message = message
+        self.word_boundary = word_boundary
+
+    def render(self, line_number: int, line: str, keyword: str) -> str:
+        return self.message.format(line_number=line_number, line=line, keyword=keyword)
+
+
+class RuleEngine:
+    """Compiles registered rules into one keyword matcher plus line counters.
+
+    All rule keywords share a single alternation regex, so a line is
+    searched once no matter how many keyword rules are registered. Counter
+    patterns are precompiled and tried in priority order until one matches.
+    """
+
+    def __init__(self) -> None:
+        self.rules: list[ScanRule] = []
+        self.counters: list[tuple[str, re.Pattern]] = []
+        self._keyword_search = None
+        self._buffer_search = None
+
+    def register(self, rule: ScanRule) -> None:
+        self.rules.append(rule)
+        self._keyword_search = None
+        self._buffer_search = None
+
+    def register_counter(self, name: str, pattern: str) -> None:
+        """Register a line counter; earlier counters win when several match."""
+        self.counters.append((name, re.compile(pattern)))
+        self._buffer_search = None
+
+    def fingerprint(self) -> str:
+        rules = [
+            (
+                rule.rule_id,
+                rule.category,
+                rule.keywords,
+                rule.message,
+                rule.word_boundary,
+            )
+            for rule in self.rules
+        ]
+        counters = [(name, pattern.pattern) for name, pattern in self.counters]
+        return json.dumps([rules, counters])
+
+    def compile(self) -> None:
+        # Longest first, so the keyword matched at a position is the longest
+        # one; shorter keywords starting there are its prefixes
+        keywords = sorted(
+            {keyword for rule in self.rules for keyword in rule.keywords},
+            key=len,
+            reverse=True,
+        )
+        # keyword -> [(rule index, rule, matched length)] for itself and
+        # every registered keyword that is a prefix of it
+        self._dispatch = {
+            keyword: [
+                (index, rule, len(other))
+                for other in keywords
+                if keyword.startswith(other)
+                for index, rule in enumerate(self.rules)
+                if other in rule.keywords
+            ]
+            for keyword in keywords
+        }
+        pattern = "|".join(re.escape(keyword) for keyword in keywords) or "(?!)"
+        self._keyword_search = re.compile(pattern).search
+
+    @staticmethod
+    def _is_word_char(char: str) -> bool:
+        return char.isalnum() or char == "_"
+
+    def _on_word_boundaries(self, line: str, start: int, end: int) -> bool:
+        return (start == 0 or not self._is_word_char(line[start - 1])) and (
+            end == len(line) or not self._is_word_char(line[end])
+        )
+
+    def rule_index(self, rule_id: str) -> int:
+        return next(
+            index for index, rule in enumerate(self.rules) if rule.rule_id == rule_id
+        )
+
+    def scan_keywords(self, line: str) -> list[tuple[int, str, int]]:
+        """Return ``(rule index, keyword, start)`` for the fired rules, each
+        at most once and in registration order."""
+        if self._keyword_search is None:
+            self.compile()
+
+        fired: dict[int, tuple[int, str, int]] = {}
+        search = self._keyword_search
+        match = search(line)
+        while match is not None:
+            start = match.start()
+            keyword = match.group()
+            for index, rule, length in self._dispatch[keyword]:
+                if index in fired:
+                    continue
+                if rule.word_boundary and not self._on_word_boundaries(
+                    line, start, start + length
+                ):
+                    continue
+                fired[index] = (index, keyword[:length], start)
+            # Step one character so overlapping keywords are found too
+            match = search(line, start + 1)
+
+        return [fired[index] for index in sorted(fired)]
+
+    def count(self, line: str) -> str | None:
+        """Name of the highest-priority counter matching the line, if any."""
+        return next(
+            (name for name, pattern in self.counters if pattern.search(line)), None
+        )
+
+    def scan(self, line: str) -> tuple[list[tuple[int, str, int]], str | None]:
+        return self.scan_keywords(line), self.count(line)
+
+    @staticmethod
+    def _line_local(pattern: str) -> bytes:
+        # Keep whitespace and negated classes from running past a newline
+        # when the pattern is applied to a whole buffer
+        return pattern.replace("[^", "[^\\n").replace("\\s", "[^\\S\\n]").encode()
+
+    def scan_buffer(
+        self, buffer: bytes | mmap.mmap, newlines: array
+    ) -> tuple[list[tuple[int, str, list[tuple[int, str, int]]]], dict[str, int]]:
+        """Scan a whole file held in memory without splitting it into lines.
+
+        Keyword matches are located over the raw bytes and only the lines
+        containing one are decoded and dispatched through ``scan_keywords``.
+        Counter patterns run over the buffer too. Line numbers are looked
+        up in ``newlines`` (see ``newline_offsets``). Returns the keyword
+        hits per line and the per-counter totals.
+        """
+        if self._keyword_search is None:
+            self.compile()
+        if self._buffer_search is None:
+            keywords = "|".join(re.escape(keyword) for keyword in self._dispatch)
+            self._buffer_search = re.compile((keywords or "(?!)").encode()).search
+            self._buffer_counters = [
+                (name, re.compile(self._line_local(pattern.pattern)))
+                for name, pattern in self.counters
+            ]
+
+        hits = []
+        match = self._buffer_search(buffer)
+        while match is not None:
+            index = bisect.bisect_left(newlines, match.start())
+            start = newlines[index - 1] + 1 if index else 0
+            end = newlines[index] if index < len(newlines) else len(buffer)
+
+            line = buffer[start:end].decode("utf-8", "replace").rstrip()
+            fired = self.scan_keywords(line)
+            if fired:
+                hits.append((index + 1, line, fired))
+            match = self._buffer_search(buffer, end + 1)
+
+        totals: dict[str, int] = {}
+        claimed: set[int] = set()  # Lines taken by higher-priority counters
+        for index, (name, pattern) in enumerate(self._buffer_counters):
+            is_last = index == len(self._buffer_counters) - 1
+            lines = {
+                bisect.bisect_left(newlines, match.start())
+                for match in pattern.finditer(buffer)
+            }
+            lines -= claimed
+            totals[name] = len(lines)
+            if not is_last:
+                claimed |= lines
+        return hits, totals
+
+
+class ReportSummary:
+    """Running totals over all reports, so summaries need no second pass.
+
+    Accepts reports through ``write`` like the report sinks do.
+    """
+
+    def __init__(self) -> None:
+        self.total_files = 0
+        self.total_lines = 0
+        self.total_warnings = 0
+        self.total_memory_issues = 0
+        self.total_legacy_issues = 0
+
+    def write(self, report: dict[str, Any]) -> None:
+        self.total_files += 1
+        self.total_lines += report.get("line_count", 0)
+        self.total_warnings += len(report.get("clang_tidy_warnings", []))
+        self.total_memory_issues += report["issue_counts"].get("memory_issues", 0)
+        self.total_legacy_issues += report["issue_counts"].get("legacy_issues", 0)
+
+    def to_html(self) -> str:
+        return f"""
+        <div style='background-color: #232323; border: 1px solid #444; padding: 15px; margin: 15px 0; border-radius: 5px;'>
+            <h2 style='color: #00ff99;'>Summary</h2>
+            <p><strong>Total Files Analyzed:</strong> {self.total_files}</p>
+            <p><strong>Total Lines of Code:</strong> {self.total_lines}</p>
+            <p><strong>Total Clang-tidy Warnings:</strong> {self.total_warnings}</p>
+
+            <p><strong>Total Memory Management Issues:</strong> {self.total_memory_issues}</p>
+            <p><strong>Total Legacy Code Issues:</strong> {self.total_legacy_issues}</p>
+        </div>
+        """
+
+
+class HtmlReportSink:
+    """Writes the HTML report while files are analyzed.
+
+    The first ``page_size`` file sections are kept in memory and written to
+    ``output_file`` together with the summary once the run ends. Every
+    further page is streamed to ``<name>-<page>.html`` as soon as it fills,
+    so large reports stay small enough for a browser to open.
+    """
+
+    SECTION_STYLE = "background-color: #454545; padding: 10px; border-radius: 5px; margin-top: 10px;"
+
+    def __init__(
+        self, output_file: str, repository_info: str, page_size: int = 1000
+    ) -> None:
+        self.output_file = output_file
+        self.repository_info = repository_info
+        self.page_size = max(1, page_size)
+        self.first_page: list[str] = []
+        self.page_number = 1
+        self.page_count = 0
+        self.page_file = None
+
+    def page_path(self, page_number: int) -> str:
+        if page_number == 1:
+            return self.output_file
+        stem, ext = os.path.splitext(self.output_file)
+        return f"{stem}-{page_number}{ext or '.html'}"
+
+    @staticmethod
+    def document_head(title: str) -> str:
+        date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return f"""
+        <html style="background-color: #121212; color: #ffffff; font-family: Arial, sans-serif; line-height: 1.6;">
+        <head><title>{title}</title></head>
+        <body>
+        <h1 style='color: #00ff99;'>C++ Code Analysis Report</h1>
+        <p style='color: #999;'>Date: {date}</p>
+        """
+
+    def navigation(self, page_number: int, has_next: bool) -> str:
+        links = []
+        if page_number > 1:
+            previous = os.path.basename(self.page_path(page_number - 1))
+            links.append(
+                f"<a href='{previous}' style='color: #00ff99;'>&larr; Page {page_number - 1}</a>"
+            )
+        if has_next:
+            following = os.path.basename(self.page_path(page_number + 1))
+            links.append(
+                f"<a href='{following}' style='color: #00ff99;'>Page {page_number + 1} &rarr;</a>"
+            )
+        return f"<p>{' | '.join(links)}</p>" if links else ""
+
+    @classmethod
+    def render_section(cls, report: dict[str, Any]) -> str:
+        file_path = report["file_path"]
+        parts = [
+            "<div style='border: 1px solid #444; background-color: #232323; padding: 15px; margin: 15px 0; border-radius: 5px;'>",
+            f"<h2 style='color: #00ff99;'><a href='{file_path}' style='color: #00ff99; text-decoration: none;'>{os.path.basename(file_path)}</a></h2>",
+            f"<p style='color: #ccc;'><strong>Description:</strong> {report['description']}</p>",
+            f"<p style='color: #ccc;'><strong>File Size:</strong> {report['file_size']}</p>",
+            "<div style='color: #ccc; margin-bottom: 10px;'>",
+            "<h4>File Statistics</h4>",
+            f"<p><strong>Lines of Code:</strong> {report.get('line_count', 0)}</p>",
+            f"<p><strong>Classes:</strong> {report.get('class_count', 0)}</p>",
+            f"<p><strong>Functions:</strong> {report.get('function_count', 0)}</p>",
+            f"<p><strong>Variables:</strong> {report.get('variable_count', 0)}</p>",
+            f"<p><strong>Used Libraries:</strong> {', '.join(report.get('used_libraries', []))}</p>",
+            f"<p><strong>Includes:</strong> {len(report.get('includes', []))}</p>",
+            "</div>",
+        ]
+
+        if "error" in report:
+            parts.append(
+                f"<pre style='color: #ff4d4d; background-color: #350000; padding: 10px; border-radius: 5px;'>Error: {report['error']}</pre>"
+            )
+
+        for key, title in (
+            ("long_lines", "Long Lines Detected:"),
+            ("memory_issues", "Memory Management Issues Detected:"),
+            ("legacy_issues", "Legacy Code Issues Detected:"),
+            ("format_issues", "Formatting Issues Detected:"),
+            ("clang_tidy_warnings", "Clang-tidy Warnings:"),
+        ):
+            if report[key]:
+                parts.append(f"<div style='{cls.SECTION_STYLE}'>")
+                parts.append(f"<h4 style='color: #ffcc00;'>{title}</h4><ul>")
+                parts.extend(f"<li>{item}</li>" for item in report[key])
+                parts.append("</ul></div>")
+
+        parts.append("</div>")  # Closing the main report block
+        return "".join(parts)
+
+    def write(self, report: dict[str, Any], section: str | None = None) -> None:
+        """Add a report, optionally as an already rendered ``section``."""
+        if section is None:
+            section = self.render_section(report)
+        if self.page_count == self.page_size:
+            self._start_next_page()
+        self.page_count += 1
+
+        if self.page_file is None:
+            self.first_page.append(section)
+        else:
+            self.page_file.write(section)
+
+    def _start_next_page(self) -> None:
+        if self.page_file is not None:
+            self._finish_page(has_next=True)
+        self.page_number += 1
+        self.page_count = 0
+        self.page_file = open(self.page_path(self.page_number), "w")
+        self.page_file.write(
+            self.document_head(f"C++ Code Analysis Report - Page {self.page_number}")
+        )
+        self.page_file.write(f"<h2>Page {self.page_number}</h2><div>")
+
+    def _finish_page(self, has_next: bool) -> None:
+        self.page_file.write("</div>")
+        self.page_file.write(self.navigation(self.page_number, has_next))
+        self.page_file.write("</body></html>")
+        self.page_file.close()
+        self.page_file = None
+
+    def close(self, summary: ReportSummary) -> None:
+        if self.page_file is not None:
+            self._finish_page(has_next=False)
+
+        with open(self.output_file, "w") as f:
+            f.write(self.document_head("C++ Code Analysis Report"))
+            f.write(self.repository_info)
+            f.write(summary.to_html())
+            f.write("<div>")
+            f.writelines(self.first_page)
+            f.write("</div>")
+            f.write(self.navigation(1, self.page_number > 1))
+            f.write("</body></html>")
+        print(f"\033[1;32mGenerated report: {self.output_file}\033[0m")  # Green
+
+
+class NdjsonReportSink:
+    """Writes one JSON object per analyzed file."""
+
+    def __init__(self, output_file: str) -> None:
+        self.output_file = output_file
+        self.file = open(output_file, "w")
+
+    def write(self, report: dict[str, Any]) -> None:
+        self.file.write(json.dumps(report))
+        self.file.write("\n")
+
+    def close(self, summary: ReportSummary) -> None:
+        self.file.close()
+        print(f"\033[1;32mGenerated report: {self.output_file}\033[0m")  # Green
+
+
+class SarifReportSink:
+    """Streams findings as a SARIF 2.1.0 log for code scanning tools."""
+
+    CLANG_TIDY_PATTERN = re.compile(
+        r"^(.+?):(\d+):(\d+): (warning|error): (.*?)(?: \[([\w.,-]+)\])?$"
+    )
+
+    def __init__(self, output_file: str) -> None:
+        self.output_file = output_file
+        self.file = open(output_file, "w")
+        self.file.write(
+            '{"$schema": "https://json.schemastore.org/sarif-2.1.0.json", '
+            '"version": "2.1.0", "runs": [{"tool": {"driver": '
+            '{"name": "analyze_cpp_code", "informationUri": '
+            '"https://github.com/alexeev-prog/usefulscripts"}}, "results": ['
+        )
+        self.first_result = True
+
+    @staticmethod
+    def result(
+        rule_id: str, level: str, message: str, uri: str, line: int, column: int = 1
+    ) -> dict[str, Any]:
+        return {
+            "ruleId": rule_id,
+            "level": level,
+            "message": {"text": message},
+            "locations": [
+                {
+                    "physicalLocation": {
+                        "artifactLocation": {
+                            "uri": Path(uri).as_uri() if os.path.isabs(uri) else uri
+                        },
+                        "region": {"startLine": line, "startColumn": column},
+                    }
+                }
+            ],
+        }
+
+    def results(self, report: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        file_path = report["file_path"]
+        for finding in report["findings"]:
+            yield self.result(
+                finding["rule_id"],
+                "warning",
+                finding["message"],
+                file_path,
+                finding["line"],
+                finding["column"],
+            )
+
+        for warning in report["clang_tidy_warnings"]:
+            match = self.CLANG_TIDY_PATTERN.match(warning)
+            if match is None:
+                continue
+            path, line, column, level, message, check = match.groups()
+            yield self.result(
+                check or "clang-tidy", level, message, path, int(line), int(column)
+            )
+
+    def write(self, report: dict[str, Any]) -> None:
+        for result in self.results(report):
+            if not self.first_result:
+                self.file.write(",")
+            self.first_result = False
+            self.file.write(json.dumps(result))
+
+    def close(self, summary: ReportSummary) -> None:
+        self.file.write("]}]}\n")
+        self.file.close()
+        print(f"\033[1;32mGenerated report: {self.output_file}\033[0m")  # Green
+
+
+def load_compile_commands(path: str) -> list[dict[str, Any]]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compile_command_arguments(entry: dict[str, Any]) -> list[str]:
+    if "arguments" in entry:
+        return list(entry["arguments"])
+    return shlex.split(entry.get("command", ""))
+
+
+def include_dirs_from_compile_commands(entries: list[dict[str, Any]]) -> list[str]:
+    """Collect the union of -I/-iquote/-isystem directories, in first-seen order."""
+    include_dirs: dict[str, None] = {}
+    for entry in entries:
+        directory = entry.get("directory", ".")
+        arguments = compile_command_arguments(entry)
+        for index, argument in enumerate(arguments):
+            for flag in ("-I", "-iquote", "-isystem"):
+                if argument == flag and index + 1 < len(arguments):
+                    value = arguments[index + 1]
+                elif argument.startswith(flag) and argument != flag:
+                    value = argument[len(flag) :]
+                else:
+                    continue
+                include_dirs[os.path.normpath(os.path.join(directory, value))] = None
+                break
+    return list(include_dirs)
+
+
+class ClangTidyRunner:
+    """Runs clang-tidy per translation unit with compile flags and a timeout.
+
+    Files listed in ``compile_commands.json`` are checked with ``-p`` so
+    clang-tidy picks up their real flags. When a compilation database is
+    given, headers missing from it are not run on their own: their
+    diagnostics arrive through the translation units including them.
+    """
+
+    HEADER_EXTENSIONS = (".h", ".hpp")
+    DIAGNOSTIC_PATTERN = re.compile(r"^(.+?):\d+:\d+: (?:warning|error):")
+
+    def __init__(
+        self,
+        compile_commands: str | None = None,
+        jobs: int | None = None,
+        timeout: float = 300,
+        profiler: Profiler | None = None,
+    ) -> None:
+        self.jobs = jobs or os.cpu_count() or 1
+        self.timeout = timeout
+        self.profiler = profiler
+        self.build_dir: str | None = None
+        self.translation_units: set[str] = set()
+        if compile_commands:
+            self.build_dir = os.path.dirname(os.path.abspath(compile_commands))
+            for entry in load_compile_commands(compile_commands):
+                self.translation_units.add(
+                    os.path.normpath(
+                        os.path.join(entry.get("directory", "."), entry["file"])
+                    )
+                )
+        self._seen_diagnostics: set[str] = set()
+
+    def command(self, file_path: str) -> list[str] | None:
+        if self.build_dir is None:
+            return ["clang-tidy", file_path, "--"]
+        if os.path.normpath(file_path) in self.translation_units:
+            return ["clang-tidy", "-p", self.build_dir, file_path]
+        if file_path.endswith(self.HEADER_EXTENSIONS):
+            return None
+        return ["clang-tidy", file_path, "--"]
+
+    def run(self, file_path: str) -> tuple[str, str | None]:
+        """Return clang-tidy output for a file and an error message, if any."""
+        command = self.command(file_path)
+        if command is None:
+            return "", None
+
+        try:
+            result, cpu = run_command(command, self.timeout)
+        except subprocess.TimeoutExpired:
+            return "", f"clang-tidy timed out after {self.timeout:g}s"
+        except OSError as e:
+            return "", f"clang-tidy could not be started: {e}"
+        if self.profiler:
+            self.profiler.add(spawns=1, cpu=cpu)
+
+        output = result.stdout + result.stderr
+        if result.returncode != 0 and not any(
+            self.DIAGNOSTIC_PATTERN.match(line) for line in output.splitlines()
+        ):
+            return output, f"clang-tidy exited with status {result.returncode}"
+        return output, None
+
+    def dedupe(self, file_path: str, warnings: list[str]) -> list[str]:
+        """Drop diagnostics in other files (headers) already reported by an
+        earlier translation unit."""
+        unique = []
+        for warning in warnings:
+            match = self.DIAGNOSTIC_PATTERN.match(warning)
+            if match and os.path.normpath(match.group(1)) != os.path.normpath(
+                file_path
+            ):
+                if warning in self._seen_diagnostics:
+                    continue
+                self._seen_diagnostics.add(warning)
+            unique.append(warning)
+        return unique
+
+
+class IncludeGraph:
+    """Persistent include graph of a source tree.
+
+    Raw includes are re-read only for files whose size or mtime changed
+    since the index was saved; resolution runs against the in-memory set
+    of known files, so dependency queries never touch the disk.
+    """
+
+    INCLUDE_PATTERN = re.compile(r'#include\s+(?:"(.+)"|<(.+)>)')
+
+    def __init__(
+        self,
+        repo_path: str,
+        include_dirs: list[str] | None = None,
+        index_path: str | None = None,
+    ) -> None:
+        self.repo_path = repo_path
+        self.include_dirs = [os.path.abspath(path) for path in include_dirs or []]
+        self.index_path = index_path
+        # file -> {"size", "mtime", "includes": [[name, quoted], ...]}
+        self.entries: dict[str, dict[str, Any]] = {}
+        self._edges: dict[str, list[str]] | None = None
+        self._reverse: dict[str, list[str]] | None = None
+        self._unresolved: dict[str, list[str]] = {}
+        self._exists: dict[str, bool] = {}
+        self.load()
+
+    @classmethod
+    def read_includes(cls, file_path: str) -> list[tuple[str, bool]]:
+        """Return ``(name, quoted)`` for every include directive of a file."""
+        includes = []
+        with open(file_path) as f:
+            for line in f:
+                match = cls.INCLUDE_PATTERN.match(line)
+                if match:
+                    quoted = match.group(1) is not None
+                    includes.append((match.group(1 if quoted else 2), quoted))
+        return includes
+
+    def load(self) -> None:
+        if not self.index_path:
+            return
+        try:
+            with open(self.index_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.entries = data.get("files", {})
+
+    def save(self) -> None:
+        if not self.index_path:
+            return
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"files": self.entries}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def update(self, file_paths: list[str]) -> None:
+        """Refresh entries of the given files, re-reading only changed ones."""
+        for file_path in file_paths:
+            self._exists.pop(file_path, None)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                self.entries.pop(file_path, None)
+                continue
+
+            entry = self.entries.get(file_path)
+            if entry and (entry["size"], entry["mtime"]) == (
+                stat.st_size,
+                stat.st_mtime_ns,
+            ):
+                continue
+
+            try:
+                includes = self.read_includes(file_path)
+            except (OSError, UnicodeDecodeError) as e:
+                # Red
+                print(f"\033[1;31mCould not read file {file_path}: {e}\033[0m")
+                includes = []
+            self.entries[file_path] = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+                "includes": [list(include) for include in includes],
+            }
+        self._edges = None
+
+    def prune(self, live_paths: set[str]) -> None:
+        """Forget files that no longer exist in the tree."""
+        self.entries = {
+            path: entry for path, entry in self.entries.items() if path in live_paths
+        }
+        self._edges = None
+
+    def _is_file(self, path: str) -> bool:
+        if path in self.entries:
+            return True
+        if path not in self._exists:
+            self._exists[path] = os.path.isfile(path)
+        return self._exists[path]
+
+    def candidates(self, file_path: str, name: str, quoted: bool) -> list[str]:
+        """Paths an include may refer to, in the compiler's search order:
+        quoted includes first look next to the including file, then every
+        include directory and the repository root are searched."""
+        bases = [os.path.dirname(file_path)] if quoted else []
+        bases += self.include_dirs
+        bases.append(self.repo_path)
+        return [os.path.normpath(os.path.join(base, name)) for base in bases]
+
+    def resolve(self, file_path: str, name: str, quoted: bool) -> str | None:
+        for candidate in self.candidates(file_path, name, quoted):
+            if self._is_file(candidate):
+                return candidate
+        return None
+
+    def _build(self) -> None:
+        self._edges = {}
+        self._reverse = {}
+        self._unresolved = {}
+        for file_path, entry in self.entries.items():
+            edges = []
+            for name, quoted in entry["includes"]:
+                resolved = self.resolve(file_path, name, quoted)
+                if resolved is None:
+                    if quoted:
+                        self._unresolved.setdefault(file_path, []).append(name)
+                        # A deleted or renamed header still has dependents:
+                        # the file depends on whichever candidate it meant
+                        for candidate in self.candidates(file_path, name, quoted):
+                            self._reverse.setdefault(candidate, []).append(file_path)
+                    continue
+                edges.append(resolved)
+                self._reverse.setdefault(resolved, []).append(file_path)
+            self._edges[file_path] = edges
+
+    def _closure(self, start: set[str], reverse: bool) -> set[str]:
+        if self._edges is None:
+            self._build()
+        graph = self._reverse if reverse else self._edges
+        seen: set[str] = set()
+        queue = deque(start)
+        while queue:
+            file_path = queue.popleft()
+            if file_path in seen:
+                continue
+            seen.add(file_path)
+            queue.extend(graph.get(file_path, ()))
+        return seen - start
+
+    def dependencies(self, file_paths: set[str]) -> set[str]:
+        """Files transitively included by any of ``file_paths``."""
+        return self._closure(file_paths, reverse=False)
+
+    def dependents(self, file_paths: set[str]) -> set[str]:
+        """Files transitively including any of ``file_paths``."""
+        return self._closure(file_paths, reverse=True)
+
+    def unresolved_includes(self, file_path: str) -> list[str]:
+        """Quoted includes of a file that resolve to no existing file.
+
+        Angled includes that cannot be found are assumed to be system
+        headers and are not reported.
+        """
+        if self._edges is None:
+            self._build()
+        return self._unresolved.get(file_path, [])
+
+
+# Analyzer instance owned by a worker process of the --jobs pool
+_worker_analyzer: "CppAnalyzer | None" = None
+
+
+def _init_worker(analyzer: "CppAnalyzer") -> None:
+    global _worker_analyzer
+    _worker_analyzer = analyzer
+    # A forked worker inherits the parent's timings; only report its own
+    analyzer.profiler.drain()
+
+
+def _scan_in_worker(file_path: str) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+    assert _worker_analyzer is not None
+    report = _worker_analyzer.process_file(file_path)
+    return report, _worker_analyzer.profiler.drain()
+
 
 class CppAnalyzer:
+    # Bump whenever analysis logic changes so cached reports are invalidated
+    RULESET_VERSION: int = 2
     MAX_LINE_LENGTH: int = 120
+    # Findings kept per rule and file; further ones are only counted
+    MAX_FINDINGS_PER_RULE: int = 1000
+    # Files at least this large are memory-mapped and scanned as bytes
+    MMAP_THRESHOLD: int = 1 << 20
     IGNORED_DIRECTORIES: list[str] = ["build", "docs", "npm-packages"]
 
     FUNCTION_GUIDELINES: dict[str, str] = {
@@ -25,24 +1110,164 @@ class CppAnalyzer:
         "cin": "https://en.cppreference.com/w/cpp/io/basic_istream/operator_gt_gt",
     }
 
-    def __init__(self, repo_path: str) -> None:
+    def __init__(
+        self,
+        repo_path: str,
+        jobs: int = 1,
+        cache_path: str | None = None,
+        cache_size: int = 50000,
+        changed_since: str | None = None,
+        include_dirs: list[str] | None = None,
+        compile_commands: str | None = None,
+        include_index_path: str | None = None,
+        tidy_jobs: int | None = None,
+        tidy_timeout: float = 300,
+        profile: bool = False,
+        max_findings: int | None = None,
+        format_mode: str = "inplace",
+    ) -> None:
         self.repo_path = os.path.abspath(repo_path)
+        self.max_findings = max_findings or self.MAX_FINDINGS_PER_RULE
+        # "inplace" runs clang-format -i on every file, "check" only
+        # reports files that differ from clang-format's output and "fix"
+        # additionally reformats exactly those files once analysis is done
+        self.format_mode = format_mode
+        self.profiler = Profiler(profile)
+        self.jobs = max(1, jobs)
+        self.changed_since = changed_since
         self.reports: list[dict[str, Any]] = []
-        self.modified_files: list[str] = self.get_modified_files()
+        self.modified_files: list[str] = self.get_modified_files(
+            changed_since or "HEAD"
+        )
+        include_dirs = list(include_dirs or [])
+        if compile_commands:
+            include_dirs += include_dirs_from_compile_commands(
+                load_compile_commands(compile_commands)
+            )
+        self.include_graph = IncludeGraph(
+            self.repo_path, include_dirs, include_index_path
+        )
+        self.clang_tidy = ClangTidyRunner(
+            compile_commands, tidy_jobs, tidy_timeout, self.profiler
+        )
+        self.rule_engine = self.build_rule_engine()
+        self.long_line_rule = self.rule_engine.rule_index("long-line")
+        self.format_rule = self.rule_engine.rule_index("needs-formatting")
+        self.cache: AnalysisCache | None = (
+            AnalysisCache(cache_path, self.cache_salt(), cache_size)
+            if cache_path
+            else None
+        )
         self.setup_console()
 
+    def __getstate__(self) -> dict[str, Any]:
+        # Worker processes never need the collected reports, the cache or
+        # the timings recorded so far
+        state = self.__dict__.copy()
+        state["reports"] = []
+        state["cache"] = None
+        state["include_graph"] = None
+        state["clang_tidy"] = None
+        state["profiler"] = Profiler(self.profiler.enabled)
+        return state
+
+    def get_clang_tidy_version(self) -> str:
+        try:
+            result = subprocess.run(
+                ["clang-tidy", "--version"],
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+        except OSError:
+            return "unavailable"
+        return result.stdout.strip()
+
+    def cache_salt(self) -> str:
+        rules = json.dumps(
+            [
+                self.RULESET_VERSION,
+                self.MAX_LINE_LENGTH,
+                self.max_findings,
+                self.format_mode == "inplace",
+                self.rule_engine.fingerprint(),
+                self.get_clang_tidy_version(),
+            ]
+        )
+        return hashlib.sha256(rules.encode()).hexdigest()
+
+    @classmethod
+    def build_rule_engine(cls) -> RuleEngine:
+        """Register all per-line checks; override to plug in extra rules."""
+        engine = RuleEngine()
+        engine.register(
+            ScanRule(
+                "long-line",
+                "long_lines",
+                (),
+                f"Line {{line_number}}: exceeds {cls.MAX_LINE_LENGTH} characters.",
+            )
+        )
+        engine.register(
+            ScanRule(
+                "needs-formatting",
+                "format_issues",
+                (),
+                "Line {line_number}: differs from clang-format output, the file needs formatting.",
+            )
+        )
+        engine.register(
+            ScanRule(
+                "memory-c-alloc",
+                "memory_issues",
+                ("malloc", "calloc", "realloc", "free"),
+                "Line {line_number}: Use of C memory management function '{line}' detected. Consider using C++ smart pointers.",
+            )
+        )
+        engine.register(
+            ScanRule(
+                "legacy-c-string",
+                "legacy_issues",
+                ("strcpy", "strcat", "sprintf", "gets", "gets_s", "strncat"),
+                "Line {line_number}: Use of legacy C function '{line}'. Consider using safer alternatives like 'strncpy' or 'snprintf'.",
+            )
+        )
+        engine.register(
+            ScanRule(
+                "include", "includes", ("#include",), "{line}", word_boundary=False
+            )
+        )
+        for func, link in cls.FUNCTION_GUIDELINES.items():
+            engine.register(
+                ScanRule(
+                    f"guideline-{func}",
+                    "memory_issues",
+                    (func,),
+                    f"Line {{line_number}}: '{{keyword}}' is called. Refer to {link}",
+                    word_boundary=False,
+                )
+            )
+
+        # Counting classes, functions, and variables
+        engine.register_counter("class_count", r"\bclass\s+\w+")
+        engine.register_counter("function_count", r"\b\w+\s*\([^)]*\)\s*{")
+        engine.register_counter("variable_count", r"\b\w+\s*;")
+        return engine
+
     def setup_console(self) -> None:
         print("\033[1;36m=============================\033[0m")  # Cyan
         print("\033[1;32m C++ Code Analyzer Initialized \033[0m")  # Green
         print("\033[1;36m=============================\033[0m")  # Cyan
 
-    def get_modified_files(self) -> list[str]:
+    def get_modified_files(self, ref: str = "HEAD") -> list[str]:
         print(
             "\033[1;33mChecking for modified C++ files in the repository...\033[0m"
         )  # Yellow
         os.chdir(self.repo_path)
         result = subprocess.run(
-            ["git", "diff", "--name-only", "HEAD"],
+            # Without rename detection a renamed file lists its old path
+            # too, so files including it by that path are selected
+            ["git", "diff", "--name-only", "--no-renames", "--relative", ref],
             capture_output=True,
             text=True,
             check=True,
@@ -59,79 +1284,114 @@ class CppAnalyzer:
         return filename.endswith((".cpp", ".h", ".hpp"))
 
     def format_file(self, file_path: str) -> None:
-        subprocess.run(["clang-format", "-i", file_path], check=True)
+        result, cpu = run_command(["clang-format", "-i", file_path])
+        self.profiler.add(spawns=1, cpu=cpu)
+        result.check_returncode()
+
+    def check_format(self, file_path: str) -> int | None:
+        """Compare a file with clang-format's output without writing it.
+
+        Returns the first line that differs, or None if the file is
+        already formatted.
+        """
+        result, cpu = run_command(["clang-format", file_path])
+        self.profiler.add(spawns=1, cpu=cpu)
+        result.check_returncode()
+
+        with open(file_path, "rb") as f:
+            content = f.read().decode("utf-8", "replace")
+        self.profiler.add(bytes_read=len(content))
+        if content == result.stdout:
+            return None
+
+        current = content.splitlines()
+        formatted = result.stdout.splitlines()
+        for line_number, (line, expected) in enumerate(
+            zip(current, formatted), start=1
+        ):
+            if line != expected:
+                return line_number
+        return min(len(current), len(formatted)) + 1
+
+    def apply_formatting(self, file_paths: list[str]) -> None:
+        """Reformat files in place, packing as many files into each
+        clang-format run as the command line allows."""
+        for batch in argv_batches(file_paths):
+            result, _ = run_command(["clang-format", "-i", *batch])
+            if result.returncode != 0:
+                # Red
+                print(
+                    f"\033[1;31mclang-format failed on {len(batch)} files: {result.stderr.strip()}\033[0m"
+                )
+        print(f"\033[1;32mReformatted {len(file_paths)} files.\033[0m")  # Green
 
     def analyze_file(self, file_path: str) -> dict[str, Any]:
-        report = {
+        report = self.scan_file(file_path)
+        self.apply_clang_tidy(report, *self.clang_tidy.run(file_path))
+        return report
+
+    def apply_clang_tidy(
+        self, report: dict[str, Any], output: str, error: str | None
+    ) -> None:
+        report["clang_tidy_warnings"] = self.extract_warnings(output)
+        if error:
+            # Red
+            print(
+                f"\033[1;31mError analyzing file {report['file_path']}: {error}\033[0m"
+            )
+            report["error"] = report["error"] or error
+
+    def new_report(
+        self, file_path: str, file_size: str, description: str
+    ) -> dict[str, Any]:
+        return {
             "file_path": file_path,
-            "file_size": self.get_file_size(file_path),
-            "description": self.get_file_description(file_path),
+            "file_size": file_size,
+            "description": description,
             "line_count": 0,
             "class_count": 0,
             "function_count": 0,
             "variable_count": 0,
             "includes": [],
-            "long_lines": [],
-            "memory_issues": [],
-            "legacy_issues": [],
+            "findings": Findings(self.max_findings),
+            "issue_counts": {},  # category -> findings, capped ones included
             "clang_tidy_warnings": [],
             "used_libraries": [],
             "error": None,
         }
 
+    def scan_file(self, file_path: str) -> dict[str, Any]:
+        """Run the per-line checks on a file, without clang-tidy."""
+        size = os.path.getsize(file_path)
+        if size >= self.MMAP_THRESHOLD:
+            return self.scan_large_file(file_path)
+
+        report = self.new_report(
+            file_path,
+            self.format_file_size(size),
+            self.get_file_description(file_path),
+        )
+        self.profiler.add(bytes_read=size)
+
         try:
             print(f"\033[1;34mAnalyzing file: {file_path}...\033[0m")  # Blue
             with open(file_path) as f:
                 for line_number, line in enumerate(f, start=1):
-                    line = line.strip()
+                    # Leading whitespace is kept so finding columns are exact
+                    line = line.rstrip()
                     report["line_count"] += 1  # Update line count
 
                     if len(line) > self.MAX_LINE_LENGTH:
-                        report["long_lines"].append(
-                            f"Line {line_number}: exceeds {self.MAX_LINE_LENGTH} characters."
-                        )
-
-                    report["memory_issues"] += self.analyze_memory_usage(
-                        line, line_number
-                    )
-                    report["legacy_issues"] += self.analyze_legacy_code(
-                        line, line_number
-                    )
-
-                    if "#include" in line:
-                        report["includes"].append(line)
-                        library = (
-                            line.split('"')[1]
-                            if '"' in line
-                            else line.split("<")[1].split(">")[0]
-                        )
-                        report["used_libraries"].append(library)
-
-                    # Counting classes, functions, and variables
-                    if re.search(r"\bclass\s+\w+", line):
-                        report["class_count"] += 1
-                    elif re.search(r"\b\w+\s*\([^)]*\)\s*{", line):
-                        report["function_count"] += 1
-                    elif re.search(r"\b\w+\s*;", line):
-                        report["variable_count"] += 1
-
-                    # Check for function calls and add links
-                    for func, link in self.FUNCTION_GUIDELINES.items():
-                        if func in line:
-                            report["memory_issues"].append(
-                                f"Line {line_number}: '{func}' is called. Refer to {link}"
+                        indent = len(line) - len(line.lstrip())
+                        if len(line) - indent > self.MAX_LINE_LENGTH:
+                            self.add_finding(
+                                report,
+                                self.long_line_rule,
+                                line_number,
+                                indent + self.MAX_LINE_LENGTH + 1,
                             )
 
-            # Running clang-tidy for static analysis
-            result = subprocess.run(
-                ["clang-tidy", file_path, "--"],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-            report["clang_tidy_warnings"] = self.extract_warnings(
-                result.stdout + result.stderr
-            )
+                    self.scan_line(report, line, line_number)
 
             return report
 
@@ -141,10 +1401,73 @@ class CppAnalyzer:
             report["error"] = str(e)  # Capture the error message
             return report
 
+    def scan_large_file(self, file_path: str) -> dict[str, Any]:
+        """Scan a memory-mapped file as bytes.
+
+        Size and description come from the same mapping, and only lines
+        with a keyword hit or a possible long line are ever decoded.
+        """
+        with open(file_path, "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as buffer:
+            end = buffer.find(b"\n")
+            first_line = buffer[: len(buffer) if end == -1 else end].decode(
+                "utf-8", "replace"
+            )
+            report = self.new_report(
+                file_path,
+                self.format_file_size(len(buffer)),
+                first_line.strip() or "No description available.",
+            )
+            self.profiler.add(bytes_read=len(buffer))
+
+            try:
+                print(f"\033[1;34mAnalyzing file: {file_path}...\033[0m")  # Blue
+                newlines = newline_offsets(buffer)
+                report["line_count"] = len(newlines) + (
+                    0 if buffer[-1:] == b"\n" else 1
+                )
+                for line_number, column in self.find_long_lines(buffer, newlines):
+                    self.add_finding(report, self.long_line_rule, line_number, column)
+
+                hits, totals = self.rule_engine.scan_buffer(buffer, newlines)
+                for line_number, line, fired in hits:
+                    self.apply_hits(report, line, line_number, fired)
+                report.update(totals)
+
+            except Exception as e:
+                # Red
+                print(f"\033[1;31mError analyzing file {file_path}: {e}\033[0m")
+                report["error"] = str(e)  # Capture the error message
+
+        return report
+
+    def find_long_lines(
+        self, buffer: bytes | mmap.mmap, newlines: array
+    ) -> list[tuple[int, int]]:
+        """Return ``(line, column)`` of the first character past the limit
+        for every long line."""
+        # Every byte is at most one character, so this over-approximates
+        # and each candidate is confirmed on its decoded text
+        pattern = re.compile(
+            rb"^[ \t\r\f\v]*[^\n]{%d}" % (self.MAX_LINE_LENGTH + 1), re.MULTILINE
+        )
+        long_lines = []
+        for match in pattern.finditer(buffer):
+            index = bisect.bisect_left(newlines, match.start())
+            end = newlines[index] if index < len(newlines) else len(buffer)
+            line = buffer[match.start() : end].decode("utf-8", "replace").rstrip()
+            indent = len(line) - len(line.lstrip())
+            if len(line) - indent > self.MAX_LINE_LENGTH:
+                long_lines.append((index + 1, indent + self.MAX_LINE_LENGTH + 1))
+        return long_lines
+
+    def format_file_size(self, size: int) -> str:
+        return f"{size / 1024:.2f} KB"  # Convert to KB
+
     def get_file_size(self, file_path: str) -> str:
         """Get file size in a human-readable format."""
-        size = os.path.getsize(file_path)
-        return f"{size / 1024:.2f} KB"  # Convert to KB
+        return self.format_file_size(os.path.getsize(file_path))
 
     def get_file_description(self, file_path: str) -> str:
         """Get a brief description of the file."""
@@ -152,35 +1475,103 @@ class CppAnalyzer:
             first_line = f.readline().strip()
         return first_line if first_line else "No description available."
 
-    def analyze_memory_usage(self, line: str, line_number: int) -> list[str]:
-        issues = []
-        memory_patterns = [
-            (
-                r"\b(malloc|calloc|realloc|free)\b",
-                f"Line {line_number}: Use of C memory management function '{line.strip()}' detected. Consider using C++ smart pointers.",
-            )
-        ]
+    def scan_line(self, report: dict[str, Any], line: str, line_number: int) -> None:
+        hits, counter = self.rule_engine.scan(line)
+        self.apply_hits(report, line, line_number, hits)
+        if counter is not None:
+            report[counter] += 1
 
-        for pattern, message in memory_patterns:
-            if re.search(pattern, line):
-                issues.append(message)
+    def apply_hits(
+        self,
+        report: dict[str, Any],
+        line: str,
+        line_number: int,
+        hits: list[tuple[int, str, int]],
+    ) -> None:
+        for index, keyword, start in hits:
+            rule = self.rule_engine.rules[index]
+            if rule.category == "includes":
+                report["includes"].append(line.strip())
+                library = (
+                    line.split('"')[1]
+                    if '"' in line
+                    else line.split("<")[1].split(">")[0]
+                )
+                report["used_libraries"].append(library)
+            else:
+                self.add_finding(
+                    report, index, line_number, start + 1, rule.keywords.index(keyword)
+                )
 
-        return issues
+    def add_finding(
+        self,
+        report: dict[str, Any],
+        rule_index: int,
+        line_number: int,
+        column: int,
+        keyword: int = 0,
+    ) -> None:
+        report["findings"].add(rule_index, line_number, column, keyword)
+        category = self.rule_engine.rules[rule_index].category
+        report["issue_counts"][category] = report["issue_counts"].get(category, 0) + 1
 
-    def analyze_legacy_code(self, line: str, line_number: int) -> list[str]:
-        issues = []
-        legacy_patterns = [
-            (
-                r"\b(strcpy|strcat|sprintf|gets|gets_s|strncat)\b",
-                f"Line {line_number}: Use of legacy C function '{line.strip()}'. Consider using safer alternatives like 'strncpy' or 'snprintf'.",
-            )
-        ]
+    @staticmethod
+    def read_lines(file_path: str, line_numbers: set[int]) -> dict[int, str]:
+        """Stripped text of the given lines of a file."""
+        texts: dict[int, str] = {}
+        last = max(line_numbers, default=0)
+        try:
+            with open(file_path, errors="replace") as f:
+                for line_number, line in enumerate(f, start=1):
+                    if line_number > last:
+                        break
+                    if line_number in line_numbers:
+                        texts[line_number] = line.strip()
+        except OSError:
+            pass
+        return texts
 
-        for pattern, message in legacy_patterns:
-            if re.search(pattern, line):
-                issues.append(message)
+    def render_report(self, report: dict[str, Any]) -> dict[str, Any]:
+        """Expand the compact findings of a report for the report sinks.
 
-        return issues
+        Messages are listed per rule category, plus a note for findings
+        dropped by the per-rule cap; ``findings`` becomes a list of dicts
+        with rule id, line, column and message. Lines quoted by a message
+        are read back from the file.
+        """
+        rules = self.rule_engine.rules
+        findings = report["findings"]
+        quoted = {
+            line for index, _, line, _ in findings if "{line}" in rules[index].message
+        }
+        texts = self.read_lines(report["file_path"], quoted) if quoted else {}
+
+        view = {**report, "findings": []}
+        for rule in rules:
+            view.setdefault(rule.category, [])
+        for index, keyword, line, column in findings:
+            rule = rules[index]
+            message = rule.render(
+                line,
+                texts.get(line, ""),
+                rule.keywords[keyword] if rule.keywords else "",
+            )
+            view[rule.category].append(message)
+            view["findings"].append(
+                {
+                    "rule_id": rule.rule_id,
+                    "line": line,
+                    "column": column,
+                    "message": message,
+                }
+            )
+        for index, count in findings.counts.items():
+            if count > findings.cap:
+                rule = rules[index]
+                view[rule.category].append(
+                    f"{count - findings.cap} more '{rule.rule_id}' findings not listed."
+                )
+        return view
 
     def extract_warnings(self, output: str) -> list[str]:
         return [
@@ -190,43 +1581,219 @@ class CppAnalyzer:
     def analyze_dependencies(self) -> list[str]:
         print("\033[1;34mAnalyzing dependencies...\033[0m")  # Blue
 
+        modified_paths = [
+            os.path.join(self.repo_path, file) for file in self.modified_files
+        ]
+        self.include_graph.update(modified_paths)
+
         dependency_warnings = []
-        for file_path in self.modified_files:
-            includes = self.find_includes(file_path)
-            for included in includes:
-                if not os.path.exists(included):
-                    dependency_warnings.append(
-                        f"File {file_path} includes a non-existent file: {included}"
-                    )
+        for file_path in modified_paths:
+            for included in self.include_graph.unresolved_includes(file_path):
+                dependency_warnings.append(
+                    f"File {file_path} includes a non-existent file: {included}"
+                )
         return dependency_warnings
 
     def find_includes(self, file_path: str) -> list[str]:
         includes = []
         try:
-            with open(file_path) as f:
-                for line in f:
-                    match = re.match(r'#include\s+"(.+)"', line) or re.match(
-                        r"#include\s+<(.+)>", line
-                    )
-                    if match:
-                        includes.append(match.group(1))
+            includes = [name for name, _ in IncludeGraph.read_includes(file_path)]
         except Exception as e:
             # Red
             print(f"\033[1;31mCould not read file {file_path}: {e}\033[0m")
         return includes
 
-    def analyze_directory(self) -> None:
-        # Blue
-        print("\033[1;34mAnalyzing all C++ files in the repository...\033[0m")
-        for root, dirs, files in os.walk(self.repo_path):
-            # Ignore specified directories
-            dirs[:] = [d for d in dirs if d not in self.IGNORED_DIRECTORIES]
-            for file in files:
-                if self.is_cpp_file(file):
-                    file_path = os.path.join(root, file)
-                    self.format_file(file_path)
-                    report = self.analyze_file(file_path)
-                    self.reports.append(report)
+    def select_changed_files(self, file_paths: list[str]) -> list[str]:
+        """Modified files plus every file transitively including one of them."""
+        changed = {os.path.join(self.repo_path, file) for file in self.modified_files}
+        if not changed:
+            return []
+
+        self.include_graph.update(file_paths)
+        self.include_graph.prune(set(file_paths))
+        self.include_graph.save()
+        selected = changed | self.include_graph.dependents(changed)
+
+        # Deleted files are not analyzed, but files that still include them,
+        # now unresolved, are selected through their candidate paths
+        return [file_path for file_path in file_paths if file_path in selected]
+
+    def iter_cpp_files(self, top: str | None = None) -> Iterator[str]:
+        # Ignored and git-ignored directories are never entered
+        for file_path in walk_files(
+            top or self.repo_path, self.IGNORED_DIRECTORIES, jobs=self.jobs
+        ):
+            if self.is_cpp_file(file_path):
+                yield file_path
+
+    def process_file(self, file_path: str) -> dict[str, Any]:
+        if self.format_mode != "inplace":
+            return self.check_and_scan_file(file_path)
+        with self.profiler.phase(file_path, "format"):
+            self.format_file(file_path)
+        with self.profiler.phase(file_path, "scan"):
+            return self.scan_file(file_path)
+
+    def check_and_scan_file(self, file_path: str) -> dict[str, Any]:
+        """Scan a file, recording a finding if it needs formatting.
+
+        Scanning comes first, so a missing file raises OSError before
+        clang-format is run on it; a failed check is recorded as the
+        report's error.
+        """
+        with self.profiler.phase(file_path, "scan"):
+            report = self.scan_file(file_path)
+        try:
+            with self.profiler.phase(file_path, "format"):
+                line_number = self.check_format(file_path)
+        except (OSError, subprocess.CalledProcessError) as e:
+            # Red
+            print(f"\033[1;31mError checking format of {file_path}: {e}\033[0m")
+            report["error"] = report["error"] or str(e)
+            return report
+        if line_number is not None:
+            self.add_finding(report, self.format_rule, line_number, 1)
+        return report
+
+    def cached_report(self, file_path: str) -> dict[str, Any] | None:
+        if self.cache is None:
+            return None
+        with self.profiler.phase(file_path, "cache"):
+            return self.cache.get(file_path)
+
+    def tidy_file(self, file_path: str) -> tuple[str, str | None]:
+        with self.profiler.phase(file_path, "clang-tidy"):
+            return self.clang_tidy.run(file_path)
+
+    def analyze_directory(self, sinks: list | None = None) -> None:
+        """Analyze the repository, handing every report to ``sinks`` as
+        soon as it is complete."""
+        all_files = list(self.iter_cpp_files())
+        if self.changed_since is None:
+            # Blue
+            print("\033[1;34mAnalyzing all C++ files in the repository...\033[0m")
+            file_paths = all_files
+        else:
+            file_paths = self.select_changed_files(all_files)
+            print(
+                f"\033[1;34mAnalyzing {len(file_paths)} C++ files changed since "
+                f"{self.changed_since} or including changed headers...\033[0m"
+            )  # Blue
+
+        if self.jobs > 1:
+            print(f"\033[1;34mUsing {self.jobs} worker processes\033[0m")  # Blue
+
+        scanned = self.scan_files(file_paths)
+        for file_path, report, cached in self.run_clang_tidy(scanned):
+            if self.cache and not cached:
+                self.cache.put(file_path, report)
+            warnings = self.clang_tidy.dedupe(file_path, report["clang_tidy_warnings"])
+            if len(warnings) != len(report["clang_tidy_warnings"]):
+                report = {**report, "clang_tidy_warnings": warnings}
+            self.reports.append(report)
+            if sinks:
+                with self.profiler.phase(file_path, "report"):
+                    view = self.render_report(report)
+                    for sink in sinks:
+                        sink.write(view)
+
+        if self.format_mode == "fix":
+            unformatted = [
+                report["file_path"]
+                for report in self.reports
+                if report["issue_counts"].get("format_issues")
+            ]
+            if unformatted:
+                self.apply_formatting(unformatted)
+
+        if self.cache:
+            self.cache.prune(set(all_files))
+            self.cache.save()
+            print(
+                f"\033[1;32mCache: {self.cache.hits} hits, {self.cache.misses} misses\033[0m"
+            )  # Green
+
+    def scan_files(self, file_paths: list[str]) -> Iterator[tuple[str, dict, bool]]:
+        """Yield ``(file_path, report, cached)`` in input order.
+
+        Reports from the cache are complete; fresh ones still lack the
+        clang-tidy results.
+        """
+        if self.jobs > 1:
+            yield from self.analyze_parallel(file_paths)
+            return
+
+        for file_path in file_paths:
+            report = self.cached_report(file_path)
+            if report is not None:
+                yield file_path, report, True
+            else:
+                yield file_path, self.process_file(file_path), False
+
+    def analyze_parallel(
+        self, file_paths: list[str]
+    ) -> Iterator[tuple[str, dict, bool]]:
+        """Scan files in a process pool, yielding results in input order.
+
+        At most ``jobs * 4`` files are in flight at once, so memory stays
+        flat no matter how large the tree is. Cache hits are resolved in
+        the parent process and never reach the pool.
+        """
+        max_pending = self.jobs * 4
+        pending: deque[tuple[str, Future, bool]] = deque()
+
+        def collect() -> tuple[str, dict, bool]:
+            file_path, future, cached = pending.popleft()
+            if cached:
+                return file_path, future.result(), cached
+            report, records = future.result()
+            self.profiler.merge(records)
+            return file_path, report, cached
+
+        with ProcessPoolExecutor(
+            max_workers=self.jobs, initializer=_init_worker, initargs=(self,)
+        ) as executor:
+            for file_path in file_paths:
+                report = self.cached_report(file_path)
+                if report is not None:
+                    future: Future = Future()
+                    future.set_result(report)
+                else:
+                    future = executor.submit(_scan_in_worker, file_path)
+                pending.append((file_path, future, report is not None))
+
+                if len(pending) >= max_pending:
+                    yield collect()
+
+            while pending:
+                yield collect()
+
+    def run_clang_tidy(
+        self, scanned: Iterator[tuple[str, dict, bool]]
+    ) -> Iterator[tuple[str, dict, bool]]:
+        """Run clang-tidy on freshly scanned files in a bounded thread pool.
+
+        Results keep the input order; cached reports pass straight through.
+        """
+        max_pending = self.clang_tidy.jobs * 4
+        pending: deque[tuple[str, dict, bool, Future | None]] = deque()
+
+        def collect() -> tuple[str, dict, bool]:
+            file_path, report, cached, future = pending.popleft()
+            if future is not None:
+                self.apply_clang_tidy(report, *future.result())
+            return file_path, report, cached
+
+        with ThreadPoolExecutor(max_workers=self.clang_tidy.jobs) as executor:
+            for file_path, report, cached in scanned:
+                future = None if cached else executor.submit(self.tidy_file, file_path)
+                pending.append((file_path, report, cached, future))
+
+                if len(pending) >= max_pending:
+                    yield collect()
+
+            while pending:
+                yield collect()
 
     def repository_information(self) -> str:
         """Retrieve and format information about the repository."""
@@ -238,139 +1805,360 @@ class CppAnalyzer:
         """
 
     def generate_report(self, output_file: str) -> None:
-        # Add summary statistics
-        html_content = self.create_html_report()
-        with open(output_file, "w") as f:
-            f.write(html_content)
-        print(f"\033[1;32mGenerated report: {output_file}\033[0m")  # Green
+        """Write the HTML report for already collected reports."""
+        sink = HtmlReportSink(
+            output_file, self.repository_information(), len(self.reports)
+        )
+        for report in self.reports:
+            sink.write(self.render_report(report))
+        sink.close(self.summarize())
 
     def create_html_report(self) -> str:
-        report_header = "<h1 style='color: #00ff99;'>C++ Code Analysis Report</h1>"
-        report_date = f"<p style='color: #999;'>Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>"
-        repository_info = self.repository_information()
-        summary = self.create_summary()
+        summary = self.summarize()
+        return "".join(
+            [
+                HtmlReportSink.document_head("C++ Code Analysis Report"),
+                self.repository_information(),
+                summary.to_html(),
+                "<div>",
+                *(
+                    HtmlReportSink.render_section(self.render_report(report))
+                    for report in self.reports
+                ),
+                "</div></body></html>",
+            ]
+        )
 
-        report_body = ""
+    def summarize(self) -> ReportSummary:
+        summary = ReportSummary()
         for report in self.reports:
-            file_path = report["file_path"]
-            report_body += "<div style='border: 1px solid #444; background-color: #232323; padding: 15px; margin: 15px 0; border-radius: 5px;'>"
-            report_body += f"<h2 style='color: #00ff99;'><a href='{file_path}' style='color: #00ff99; text-decoration: none;'>{os.path.basename(file_path)}</a></h2>"
-            report_body += f"<p style='color: #ccc;'><strong>Description:</strong> {report['description']}</p>"
-            report_body += f"<p style='color: #ccc;'><strong>File Size:</strong> {report['file_size']}</p>"
-
-            report_body += "<div style='color: #ccc; margin-bottom: 10px;'>"
-            report_body += "<h4>File Statistics</h4>"
-            report_body += (
-                f"<p><strong>Lines of Code:</strong> {report.get('line_count', 0)}</p>"
-            )
-            report_body += (
-                f"<p><strong>Classes:</strong> {report.get('class_count', 0)}</p>"
-            )
-            report_body += (
-                f"<p><strong>Functions:</strong> {report.get('function_count', 0)}</p>"
-            )
+            summary.write(report)
+        return summary
 
-            report_body += (
-                f"<p><strong>Variables:</strong> {report.get('variable_count', 0)}</p>"
-            )
-            report_body += f"<p><strong>Used Libraries:</strong> {', '.join(report.get('used_libraries', []))}</p>"
-            report_body += (
-                f"<p><strong>Includes:</strong> {len(report.get('includes', []))}</p>"
-            )
-            report_body += "</div>"
+    def create_summary(self) -> str:
+        return self.summarize().to_html()
 
-            if "error" in report:
-                report_body += f"<pre style='color: #ff4d4d; background-color: #350000; padding: 10px; border-radius: 5px;'>Error: {report['error']}</pre>"
+    def run_analysis(
+        self,
+        output_file: str = "report.html",
+        ndjson_file: str | None = None,
+        sarif_file: str | None = None,
+        page_size: int = 1000,
+    ) -> None:
+        print("\033[1;33mStarting analysis...\033[0m")  # Yellow
+        sinks: list = [
+            HtmlReportSink(output_file, self.repository_information(), page_size)
+        ]
+        if ndjson_file:
+            sinks.append(NdjsonReportSink(ndjson_file))
+        if sarif_file:
+            sinks.append(SarifReportSink(sarif_file))
 
-            # Long lines section
-            if report["long_lines"]:
-                report_body += "<div style='background-color: #454545; padding: 10px; border-radius: 5px; margin-top: 10px;'>"
-                report_body += (
-                    "<h4 style='color: #ffcc00;'>Long Lines Detected:</h4><ul>"
-                )
-                for long_line in report["long_lines"]:
-                    report_body += f"<li>{long_line}</li>"
-                report_body += "</ul></div>"
-
-            # Memory issues
-            if report["memory_issues"]:
-                report_body += "<div style='background-color: #454545; padding: 10px; border-radius: 5px; margin-top: 10px;'>"
-                report_body += "<h4 style='color: #ffcc00;'>Memory Management Issues Detected:</h4><ul>"
-                for issue in report["memory_issues"]:
-                    report_body += f"<li>{issue}</li>"
-                report_body += "</ul></div>"
-
-            # Legacy issues
-            if report["legacy_issues"]:
-                report_body += "<div style='background-color: #454545; padding: 10px; border-radius: 5px; margin-top: 10px;'>"
-                report_body += (
-                    "<h4 style='color: #ffcc00;'>Legacy Code Issues Detected:</h4><ul>"
-                )
-                for issue in report["legacy_issues"]:
-                    report_body += f"<li>{issue}</li>"
-                report_body += "</ul></div>"
-
-            # Clang-tidy warnings
-            if report["clang_tidy_warnings"]:
-                report_body += "<div style='background-color: #454545; padding: 10px; border-radius: 5px; margin-top: 10px;'>"
-                report_body += (
-                    "<h4 style='color: #ffcc00;'>Clang-tidy Warnings:</h4><ul>"
-                )
-                for warning in report["clang_tidy_warnings"]:
-                    report_body += f"<li>{warning}</li>"
-                report_body += "</ul></div>"
+        summary = ReportSummary()
+        self.analyze_directory([*sinks, summary])
+        for sink in sinks:
+            sink.close(summary)
 
-            report_body += "</div>"  # Closing the main report block
+    def write_reports(
+        self,
+        output_file: str = "report.html",
+        ndjson_file: str | None = None,
+        sarif_file: str | None = None,
+        page_size: int = 1000,
+        sections: dict[str, str] | None = None,
+    ) -> None:
+        """Rewrite all report files from the collected reports.
 
-        return f"""
-        <html style="background-color: #121212; color: #ffffff; font-family: Arial, sans-serif; line-height: 1.6;">
-        <head><title>C++ Code Analysis Report</title></head>
-        <body>
-        {report_header}
-        {report_date}
-        {repository_info}
-        {summary}
-        <div>{report_body}</div>
-        </body>
-        </html>
+        HTML sections already in ``sections`` are reused instead of being
+        rendered again; newly rendered ones are added to it.
         """
+        if sections is None:
+            sections = {}
+        html = HtmlReportSink(output_file, self.repository_information(), page_size)
+        sinks: list = []
+        if ndjson_file:
+            sinks.append(NdjsonReportSink(ndjson_file))
+        if sarif_file:
+            sinks.append(SarifReportSink(sarif_file))
 
-    def create_summary(self) -> str:
-        total_files = len(self.reports)
-        total_lines = sum(report.get("line_count", 0) for report in self.reports)
-        total_warnings = sum(
-            len(report.get("clang_tidy_warnings", [])) for report in self.reports
-        )
-        total_memory_issues = sum(
-            len(report.get("memory_issues", [])) for report in self.reports
-        )
-        total_legacy_issues = sum(
-            len(report.get("legacy_issues", [])) for report in self.reports
-        )
+        summary = ReportSummary()
+        for report in self.reports:
+            file_path = report["file_path"]
+            # The summary works on compact reports; only render for sinks
+            # that need messages
+            view = None
+            if file_path not in sections or sinks:
+                view = self.render_report(report)
+            if file_path not in sections:
+                sections[file_path] = html.render_section(view)
+            html.write(view or report, sections[file_path])
+            for sink in sinks:
+                sink.write(view)
+            summary.write(report)
+        for sink in [html, *sinks]:
+            sink.close(summary)
 
-        return f"""
-        <div style='background-color: #232323; border: 1px solid #444; padding: 15px; margin: 15px 0; border-radius: 5px;'>
-            <h2 style='color: #00ff99;'>Summary</h2>
-            <p><strong>Total Files Analyzed:</strong> {total_files}</p>
-            <p><strong>Total Lines of Code:</strong> {total_lines}</p>
-            <p><strong>Total Clang-tidy Warnings:</strong> {total_warnings}</p>
+    def touched_files(self, events: list[Event]) -> list[str]:
+        """C++ files affected by a batch of inotify events.
 
-            <p><strong>Total Memory Management Issues:</strong> {total_memory_issues}</p>
-            <p><strong>Total Legacy Code Issues:</strong> {total_legacy_issues}</p>
-        </div>
+        A directory moved in or out of the tree touches every file below
+        it; after a queue overflow everything is considered touched.
         """
+        known = {report["file_path"] for report in self.reports}
+        touched: set[str] = set()
+        for event in events:
+            if event.mask & IN_Q_OVERFLOW:
+                return sorted(known | set(self.iter_cpp_files()))
+            if event.mask & IN_ISDIR:
+                prefix = event.path + os.sep
+                touched.update(path for path in known if path.startswith(prefix))
+                if os.path.isdir(event.path):
+                    touched.update(self.iter_cpp_files(event.path))
+            elif self.is_cpp_file(event.path):
+                touched.add(event.path)
+        return sorted(touched)
 
-    def run_analysis(self) -> None:
-        print("\033[1;33mStarting analysis...\033[0m")  # Yellow
-        self.analyze_directory()
-        self.generate_report("report.html")
+    def reanalyze(self, file_paths: list[str]) -> None:
+        """Replace the reports of the given files with fresh ones.
+
+        Files are scanned and checked with clang-tidy but, unlike a full
+        run, never reformatted: rewriting a file that an editor has just
+        saved would fight the editor. In "check" and "fix" format mode the
+        formatting check still runs. Reports of deleted files are dropped
+        and new files are appended. Header diagnostics are not deduplicated
+        as in a full run: the report replaced may be the one that first
+        carried them, so a re-analyzed file keeps all its diagnostics.
+        """
+        self.include_graph.update(file_paths)
 
+        def scanned() -> Iterator[tuple[str, dict, bool]]:
+            for file_path in file_paths:
+                try:
+                    if self.format_mode == "inplace":
+                        with self.profiler.phase(file_path, "scan"):
+                            report = self.scan_file(file_path)
+                    else:
+                        report = self.check_and_scan_file(file_path)
+                except OSError:
+                    continue  # Deleted, or replaced by a directory
+                yield file_path, report, False
 
-if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python check_cpp_code.py <path_to_git_repository>")
-        sys.exit(1)
+        fresh = {}
+        for file_path, report, _ in self.run_clang_tidy(scanned()):
+            if self.cache:
+                self.cache.put(file_path, report)
+            fresh[file_path] = report
+
+        removed = set(file_paths) - set(fresh)
+        reports = [
+            fresh.pop(report["file_path"], report)
+            for report in self.reports
+            if report["file_path"] not in removed
+        ]
+        self.reports = reports + list(fresh.values())
+
+    def watch(
+        self,
+        output_file: str = "report.html",
+        ndjson_file: str | None = None,
+        sarif_file: str | None = None,
+        page_size: int = 1000,
+        debounce: float = 0.2,
+    ) -> None:
+        """Analyze the repository, then keep re-analyzing files as they are
+        saved until interrupted.
+
+        Reports and the include graph stay in memory between saves, so
+        each batch of changes costs only the touched files and a rewrite of
+        the report files, which reuses the HTML of untouched files.
+        """
+        self.run_analysis(output_file, ndjson_file, sarif_file, page_size)
+        sections: dict[str, str] = {}
+
+        with Inotify() as inotify:
+            inotify.add_tree(
+                self.repo_path,
+                IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE,
+                self.IGNORED_DIRECTORIES,
+            )
+            print(
+                f"\033[1;36mWatching {self.repo_path} for changes, press Ctrl+C to stop\033[0m"
+            )  # Cyan
+            try:
+                while True:
+                    file_paths = self.touched_files(inotify.read_batch(debounce))
+                    if not file_paths:
+                        continue
 
-    repo_path = sys.argv[1]
-    analyzer = CppAnalyzer(repo_path)
-    analyzer.run_analysis()
+                    start = time.perf_counter()
+                    self.reanalyze(file_paths)
+                    for file_path in file_paths:
+                        sections.pop(file_path, None)
+                    self.write_reports(
+                        output_file, ndjson_file, sarif_file, page_size, sections
+                    )
+                    elapsed = time.perf_counter() - start
+                    print(
+                        f"\033[1;32mRe-analyzed {len(file_paths)} files in {elapsed:.3f}s\033[0m"
+                    )  # Green
+            except KeyboardInterrupt:
+                print("\033[1;33mStopped watching.\033[0m")  # Yellow
+
+        if self.cache:
+            self.cache.save()
+        self.include_graph.save()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="C++ code analyzer")
+    parser.add_argument("repo_path", help="Path to git repository")
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of worker processes for per-file analysis",
+    )
+    parser.add_argument(
+        "--cache",
+        nargs="?",
+        const=".cpp_analyzer_cache.json",
+        default=None,
+        help="Reuse reports of unchanged files from this cache file",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=50000,
+        help="Maximum number of cached file reports",
+    )
+    parser.add_argument(
+        "--changed-since",
+        metavar="REF",
+        default=None,
+        help="Only analyze files changed since REF and the files including them",
+    )
+    parser.add_argument(
+        "-I",
+        "--include-dir",
+        dest="include_dirs",
+        action="append",
+        default=[],
+        help="Directory searched when resolving includes (repeatable)",
+    )
+    parser.add_argument(
+        "--compile-commands",
+        default=None,
+        help="compile_commands.json providing include directories",
+    )
+    parser.add_argument(
+        "--output", "-o", default="report.html", help="HTML report file"
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=1000,
+        help="Files per HTML report page; further pages go to <output>-N.html",
+    )
+    parser.add_argument(
+        "--ndjson", default=None, help="Also write reports as newline-delimited JSON"
+    )
+    parser.add_argument("--sarif", default=None, help="Also write a SARIF 2.1.0 log")
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="cpp_analyzer_profile.json",
+        default=None,
+        help="Time every phase per file and write the timings to this file",
+    )
+    parser.add_argument(
+        "--tidy-jobs",
+        type=int,
+        default=None,
+        help="Number of concurrent clang-tidy processes (default: CPU count)",
+    )
+    parser.add_argument(
+        "--tidy-timeout",
+        type=float,
+        default=300,
+        help="Seconds before a clang-tidy run on one file is abandoned",
+    )
+    parser.add_argument(
+        "--include-index",
+        nargs="?",
+        const=".cpp_include_index.json",
+        default=None,
+        help="Persist the include graph in this file between runs",
+    )
+    parser.add_argument(
+        "--format",
+        dest="format_mode",
+        choices=["inplace", "check", "fix"],
+        default="inplace",
+        help="inplace: clang-format -i every file; check: only report files "
+        "needing formatting; fix: check, then reformat just those files",
+    )
+    parser.add_argument(
+        "--max-findings",
+        type=int,
+        default=None,
+        help="Findings listed per rule and file; further ones are only counted "
+        f"(default: {CppAnalyzer.MAX_FINDINGS_PER_RULE})",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and re-analyze files whenever they are saved",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=0.2,
+        help="Seconds without changes before a batch of saves is re-analyzed",
+    )
+
+    args = parser.parse_args()
+
+    analyzer = CppAnalyzer(
+        args.repo_path,
+        jobs=args.jobs,
+        cache_path=os.path.abspath(args.cache) if args.cache else None,
+        cache_size=args.cache_size,
+        changed_since=args.changed_since,
+        include_dirs=[os.path.abspath(path) for path in args.include_dirs],
+        compile_commands=(
+            os.path.abspath(args.compile_commands) if args.compile_commands else None
+        ),
+        include_index_path=(
+            os.path.abspath(args.include_index) if args.include_index else None
+        ),
+        tidy_jobs=args.tidy_jobs,
+        tidy_timeout=args.tidy_timeout,
+        profile=args.profile is not None,
+        max_findings=args.max_findings,
+        format_mode=args.format_mode,
+    )
+    # Relative report paths land in the repository, like report.html always did
+    if args.watch:
+        analyzer.watch(
+            args.output,
+            ndjson_file=args.ndjson,
+            sarif_file=args.sarif,
+            page_size=args.page_size,
+            debounce=args.debounce,
+        )
+    else:
+        analyzer.run_analysis(
+            args.output,
+            ndjson_file=args.ndjson,
+            sarif_file=args.sarif,
+            page_size=args.page_size,
+        )
+
+    if args.profile:
+        analyzer.profiler.print_summary()
+        analyzer.profiler.write(args.profile)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+from analyze_cpp_code import CppAnalyzer, HtmlReportSink, ReportSummary
+
+SAMPLE_LINES = [
+    "#include <vector>",
+    '#include "project/module.h"',
+    "class Widget : public Base {",
+    "int count = 0;",
+    "void Widget::update(int delta) {",
+    "    char* buffer = (char*)malloc(size);",
+    "    strcpy(buffer, source);",
+    '    std::cout << "value: " << value << std::endl;',
+    "    for (int i = 0; i < size; ++i) { total += values[i]; }",
+    "    return result;",
+    "}",
+    "// plain comment line without any interesting tokens",
+]
+
+FILLER_LINES = [
+    "    int value_{n} = compute(value_{m}, {n});",
+    "    if (value_{n} > limit) {{ value_{n} = limit; }}",
+    "    result += values[{n}] * weights[{m}];",
+    "    // step {n}: keep the accumulator in range",
+    "void helper_{n}(int argument) {{",
+    "}}",
+    "class Type{n} {{ int member_{m}; }};",
+]
+
+HIT_LINES = [
+    "    char* buffer_{n} = (char*)malloc({n});",
+    "    strcpy(buffer_{n}, source_{m});",
+    "    free(buffer_{n});",
+]
+
+STUB_CLANG_FORMAT = """#!/bin/sh
+[ "$1" = "--version" ] && echo "clang-format version stub"
+exit 0
+"""
+
+STUB_CLANG_TIDY = """#!/bin/sh
+[ "$1" = "--version" ] && echo "LLVM version stub"
+exit 0
+"""
+
+
+def synthetic_lines(count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return [rng.choice(SAMPLE_LINES) for _ in range(count)]
+
+
+def generate_corpus(
+    root: str,
+    files: int,
+    lines: int,
+    line_length: int = 80,
+    include_fanout: int = 3,
+    hit_density: float = 0.05,
+    seed: int = 0,
+) -> int:
+    """Write a synthetic C++ tree under ``root``, return its total line count.
+
+    A quarter of the files are headers in ``include/``, the rest are
+    sources spread over ``src/dirN``. Every file includes
+    ``include_fanout`` random headers and ``hit_density`` of the body lines
+    call malloc/strcpy/free.
+    """
+    rng = random.Random(seed)
+    header_count = max(1, files // 4)
+    headers = [f"header_{index}.h" for index in range(header_count)]
+    os.makedirs(os.path.join(root, "include"), exist_ok=True)
+
+    total_lines = 0
+    for index in range(files):
+        if index < header_count:
+            path = os.path.join(root, "include", headers[index])
+        else:
+            directory = os.path.join(root, "src", f"dir{index % 16}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"source_{index}.cpp")
+
+        body = [f"// Synthetic file {index}"]
+        body += [
+            f'#include "{rng.choice(headers)}"'
+            for _ in range(min(include_fanout, header_count))
+        ]
+        while len(body) < lines:
+            templates = HIT_LINES if rng.random() < hit_density else FILLER_LINES
+            line = rng.choice(templates).format(
+                n=rng.randrange(1000), m=rng.randrange(1000)
+            )
+            if len(line) < line_length:
+                line += " " * (line_length - len(line) - 3) + "//"
+            body.append(line)
+
+        with open(path, "w") as f:
+            f.write("\n".join(body))
+            f.write("\n")
+        total_lines += len(body)
+    return total_lines
+
+
+def install_stub_tools(bin_dir: str) -> None:
+    """Put no-op clang-format/clang-tidy first on PATH."""
+    os.makedirs(bin_dir, exist_ok=True)
+    for name, script in (
+        ("clang-format", STUB_CLANG_FORMAT),
+        ("clang-tidy", STUB_CLANG_TIDY),
+    ):
+        path = os.path.join(bin_dir, name)
+        with open(path, "w") as f:
+            f.write(script)
+        os.chmod(path, 0o755)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ.get("PATH", "")
+
+
+class BenchAnalyzer(CppAnalyzer):
+    """CppAnalyzer for corpora that are not git repositories."""
+
+    def get_modified_files(self, ref: str = "HEAD") -> list[str]:
+        os.chdir(self.repo_path)
+        return []
+
+
+# Each benchmark returns the seconds spent on the measured work only
+
+
+def bench_rules(corpus: str, lines: int, jobs: int) -> float:
+    engine = CppAnalyzer.build_rule_engine()
+    sample = synthetic_lines(lines)
+    start = time.perf_counter()
+    for line in sample:
+        engine.scan(line)
+    return time.perf_counter() - start
+
+
+def bench_analyze_file(corpus: str, lines: int, jobs: int) -> float:
+    analyzer = BenchAnalyzer(corpus)
+    file_paths = list(analyzer.iter_cpp_files())
+    start = time.perf_counter()
+    for file_path in file_paths:
+        analyzer.analyze_file(file_path)
+    return time.perf_counter() - start
+
+
+def bench_analyze_directory(corpus: str, lines: int, jobs: int) -> float:
+    analyzer = BenchAnalyzer(corpus, jobs=jobs)
+    start = time.perf_counter()
+    analyzer.analyze_directory()
+    return time.perf_counter() - start
+
+
+def bench_report(corpus: str, lines: int, jobs: int) -> float:
+    analyzer = BenchAnalyzer(corpus, jobs=jobs)
+    analyzer.analyze_directory()
+    output_file = os.path.join(tempfile.mkdtemp(), "report.html")
+    start = time.perf_counter()
+    sink = HtmlReportSink(output_file, analyzer.repository_information())
+    summary = ReportSummary()
+    for report in analyzer.reports:
+        sink.write(analyzer.render_report(report))
+        summary.write(report)
+    sink.close(summary)
+    elapsed = time.perf_counter() - start
+    shutil.rmtree(os.path.dirname(output_file))
+    return elapsed
+
+
+BENCHMARKS = {
+    "rules": bench_rules,
+    "analyze_file": bench_analyze_file,
+    "analyze_directory": bench_analyze_directory,
+    "report": bench_report,
+}
+
+
+def run_benchmark(name: str, corpus: str, lines: int, jobs: int) -> dict[str, Any]:
+    """Run one benchmark; meant to be called in a fresh child process so the
+    peak RSS belongs to this benchmark alone."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        elapsed = BENCHMARKS[name](corpus, lines, jobs)
+    peak_kb = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return {
+        "seconds": elapsed,
+        "lines_per_sec": lines / elapsed,
+        "peak_rss_mb": peak_kb / 1024,
+    }
+
+
+def compare(
+    results: dict[str, dict[str, Any]],
+    baseline: dict[str, dict[str, Any]],
+    max_regression: float,
+) -> bool:
+    """Print the change against the baseline, return False on a regression."""
+    ok = True
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        speed = result["lines_per_sec"] / baseline[name]["lines_per_sec"]
+        memory = result["peak_rss_mb"] / baseline[name]["peak_rss_mb"]
+        regressed = speed < 1 - max_regression or memory > 1 + max_regression
+        ok = ok and not regressed
+        color = "\033[1;31m" if regressed else "\033[1;32m"  # Red / Green
+        print(f"{color}{name:<18} speed x{speed:.2f}  peak RSS x{memory:.2f}\033[0m")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="CppAnalyzer benchmark suite")
+    parser.add_argument(
+        "--bench",
+        action="append",
+        choices=list(BENCHMARKS),
+        help="Benchmark to run (repeatable, default: all)",
+    )
+    parser.add_argument("--files", type=int, default=200, help="Files in the corpus")
+    parser.add_argument("--lines", type=int, default=200, help="Lines per file")
+    parser.add_argument(
+        "--line-length", type=int, default=80, help="Minimum body line length"
+    )
+    parser.add_argument(
+        "--include-fanout", type=int, default=3, help="Includes per file"
+    )
+    parser.add_argument(
+        "--hit-density",
+        type=float,
+        default=0.05,
+        help="Share of body lines calling malloc/strcpy/free",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument(
+        "--jobs", "-j", type=int, default=1, help="Worker processes for analysis"
+    )
+    parser.add_argument(
+        "--corpus", default=None, help="Keep the generated corpus in this directory"
+    )
+    parser.add_argument(
+        "--baseline", default=None, help="Compare against results stored in this file"
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store the results in the --baseline file",
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.1,
+        help="Tolerated relative slowdown or memory growth against the baseline",
+    )
+
+    args = parser.parse_args()
+
+    corpus = args.corpus or tempfile.mkdtemp(prefix="cpp_bench_")
+    total_lines = generate_corpus(
+        corpus,
+        args.files,
+        args.lines,
+        args.line_length,
+        args.include_fanout,
+        args.hit_density,
+        args.seed,
+    )
+    bin_dir = tempfile.mkdtemp(prefix="cpp_bench_bin_")
+    install_stub_tools(bin_dir)
+    print(
+        f"\033[1;36mCorpus: {args.files} files, {total_lines} lines in {corpus}\033[0m"
+    )  # Cyan
+
+    results = {}
+    for name in args.bench or list(BENCHMARKS):
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            result = executor.submit(
+                run_benchmark, name, os.path.abspath(corpus), total_lines, args.jobs
+            ).result()
+        results[name] = result
+        print(
+            f"{name:<18} {result['lines_per_sec']:>14,.0f} lines/sec  "
+            f"{result['seconds']:>8.3f}s  peak RSS {result['peak_rss_mb']:.1f} MB"
+        )
+
+    shutil.rmtree(bin_dir)
+    if args.corpus is None:
+        shutil.rmtree(corpus)
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\033[1;32mSaved baseline: {args.baseline}\033[0m")  # Green
+    elif args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if not compare(results, baseline, args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,24 @@
 #!/usr/bin/env python3
 import argparse
+import errno
+import hashlib
 import json
 import logging
+import logging.handlers
 import os
-from collections.abc import Iterable
+import queue
+import re
+import sys
+import threading
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from stat import S_ISREG
+from typing import NamedTuple
 
-logging.basicConfig(
-    filename=".file_sorter.log",
-    level=logging.DEBUG,
-    format="[%(asctime)s] %(levelname)s - %(message)s",
-    datefmt="%H:%M:%S",
-    encoding="utf-8",
-)
-
-logging.getLogger().addHandler(logging.StreamHandler())
-
+from inotify_watch import IN_CLOSE_WRITE, IN_ISDIR, IN_MOVED_TO, IN_Q_OVERFLOW, Inotify
 
 __author__ = "alexeev-prog"
 __version__ = "v0.1.0"
@@ -179,9 +182,411 @@ def load_extensions(filename: str = "extensions.json"):
 EXTENSIONS = load_extensions()
 
 
+class RecordQueueHandler(logging.handlers.QueueHandler):
+    """Queues records untouched. They are consumed by a thread of this
+    process, so formatting them up front, as QueueHandler does to make
+    them picklable, would only slow down the logging thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class LogWriter:
+    """Writes log records on a background thread.
+
+    Logging calls only put records on a queue. The writer thread takes
+    everything queued so far, formats it and writes it with one write and
+    one flush per destination, so a burst of per-file records costs a few
+    system calls instead of several per record. The log file gets every
+    record, the console those at ``console_level`` and up, and the
+    optional NDJSON ``event_log`` every record logged with an ``event``
+    in ``extra``. Progress lines and summaries are logged as well, so the
+    console shows everything in order.
+    """
+
+    BATCH_SIZE = 1000
+
+    def __init__(
+        self,
+        log_path: str,
+        console_level: int = logging.INFO,
+        event_log: str | None = None,
+    ) -> None:
+        self.records: queue.SimpleQueue = queue.SimpleQueue()
+        self.console_level = console_level
+        self.log_file = open(log_path, "a", encoding="utf-8")
+        self.event_file = open(event_log, "a", encoding="utf-8") if event_log else None
+        self.formatter = logging.Formatter(
+            "[%(asctime)s] %(levelname)s - %(message)s", "%H:%M:%S"
+        )
+        self.console_formatter = logging.Formatter()
+        self.handler = RecordQueueHandler(self.records)
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+
+    def __enter__(self) -> "LogWriter":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        root = logging.getLogger()
+        root.setLevel(logging.DEBUG)
+        root.addHandler(self.handler)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Write out everything logged so far and close the files."""
+        logging.getLogger().removeHandler(self.handler)
+        self.records.put(None)
+        self.thread.join()
+        self.log_file.close()
+        if self.event_file is not None:
+            self.event_file.close()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self.records.get()]
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(self.records.get_nowait())
+                except queue.Empty:
+                    break
+            if not self._write(batch):
+                return
+
+    def _write(self, batch: list[logging.LogRecord | None]) -> bool:
+        """Write a batch, returning False once the stop marker is seen."""
+        log_lines = []
+        console_lines = []
+        events = []
+        running = True
+        for record in batch:
+            if record is None:
+                running = False
+                continue
+            log_lines.append(self.formatter.format(record))
+            if record.levelno >= self.console_level:
+                console_lines.append(self.console_formatter.format(record))
+            event = getattr(record, "event", None)
+            if event is not None and self.event_file is not None:
+                events.append(
+                    json.dumps(
+                        {"time": round(record.created, 3), **event},
+                        separators=(",", ":"),
+                    )
+                )
+
+        for file, lines in (
+            (self.log_file, log_lines),
+            (sys.stderr, console_lines),
+            (self.event_file, events),
+        ):
+            if lines:
+                file.write("\n".join(lines) + "\n")
+                file.flush()
+        return running
+
+
+def file_suffix(filename: str) -> str:
+    """Same as ``Path(filename).suffix`` without building a Path."""
+    index = filename.rfind(".")
+    return filename[index:] if 0 < index < len(filename) - 1 else ""
+
+
+class ExtensionIndex:
+    """Extension -> category lookup compiled from an extensions config.
+
+    Categories are tried in config order, so an extension listed twice
+    belongs to its first category. A category containing ``"*"`` takes
+    every file no earlier category claimed, and categories after it never
+    receive anything. Extensions are matched case-insensitively.
+    """
+
+    def __init__(self, extensions: dict) -> None:
+        self.categories: dict[str, tuple[str, str]] = {}
+        self.fallback: tuple[str, str] | None = None
+
+        for name, ext_data in extensions.items():
+            category = (name, ext_data["directory_name"])
+            if "*" in ext_data["exts"]:
+                self.fallback = category
+                break
+            for extension in ext_data["exts"]:
+                self.categories.setdefault(extension.lower(), category)
+
+    def lookup(self, filename: str) -> tuple[str, str] | None:
+        """Return ``(category name, directory name)`` for a file, if any."""
+        return self.lookup_extension(file_suffix(filename))
+
+    def lookup_extension(self, extension: str) -> tuple[str, str] | None:
+        return self.categories.get(extension.lower(), self.fallback)
+
+
+# name, offset, magic bytes (a regex), extension it stands for, and whether
+# it is specific enough to override the file's own extension. Generic
+# containers (zip, ftyp, OLE) only classify files with unknown extensions,
+# so a .docx is not mistaken for an archive. More specific entries first.
+MAGIC_SIGNATURES = [
+    ("pdf", 0, rb"%PDF-", ".pdf", True),
+    ("png", 0, rb"\x89PNG\r\n\x1a\n", ".png", True),
+    ("jpeg", 0, rb"\xff\xd8\xff", ".jpg", True),
+    ("gif", 0, rb"GIF8[79]a", ".gif", True),
+    ("webp", 0, rb"RIFF.{4}WEBP", ".webp", True),
+    ("wav", 0, rb"RIFF.{4}WAVE", ".wav", True),
+    ("avi", 0, rb"RIFF.{4}AVI ", ".avi", True),
+    ("epub", 30, rb"mimetypeapplication/epub\+zip", ".epub", True),
+    ("odt", 30, rb"mimetypeapplication/vnd\.oasis\.opendocument\.text", ".odt", True),
+    (
+        "ods",
+        30,
+        rb"mimetypeapplication/vnd\.oasis\.opendocument\.spreadsheet",
+        ".ods",
+        True,
+    ),
+    (
+        "odp",
+        30,
+        rb"mimetypeapplication/vnd\.oasis\.opendocument\.presentation",
+        ".odp",
+        True,
+    ),
+    ("zip", 0, rb"PK\x03\x04", ".zip", False),
+    ("rar", 0, rb"Rar!\x1a\x07", ".rar", True),
+    ("sevenzip", 0, rb"7z\xbc\xaf\x27\x1c", ".7z", True),
+    ("xz", 0, rb"\xfd7zXZ\x00", ".xz", True),
+    ("bzip2", 0, rb"BZh[1-9]1AY&SY", ".bz", True),
+    ("gzip", 0, rb"\x1f\x8b\x08", ".gz", False),
+    ("flac", 0, rb"fLaC", ".flac", True),
+    ("mp3", 0, rb"ID3", ".mp3", True),
+    ("ogg", 0, rb"OggS", ".ogg", False),
+    ("matroska", 0, rb"\x1a\x45\xdf\xa3", ".mkv", True),
+    ("heic", 4, rb"ftyp(?:heic|heix|mif1)", ".heic", True),
+    ("m4a", 4, rb"ftypM4A ", ".m4a", True),
+    ("quicktime", 4, rb"ftypqt  ", ".mov", True),
+    ("mp4", 4, rb"ftyp", ".mp4", False),
+    ("rtf", 0, rb"\{\\rtf", ".rtf", True),
+    ("ole", 0, rb"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", ".doc", False),
+    ("woff", 0, rb"wOFF", ".woff", True),
+    ("woff2", 0, rb"wOF2", ".woff2", True),
+    ("opentype", 0, rb"OTTO", ".otf", True),
+    ("html", 0, rb"\s*(?i:<!doctype html|<html)", ".html", False),
+    ("script", 0, rb"#!", ".sh", False),
+]
+
+
+class MagicSniffer:
+    """Identifies files by their first bytes.
+
+    All signatures are compiled into one anchored regex, so a header is
+    matched in a single pass. Each new file costs one ``pread`` of
+    ``HEADER_SIZE`` bytes; results are cached by device, inode, size and
+    mtime, which a rename within the file system keeps, and persisted in
+    ``cache_path``.
+    """
+
+    HEADER_SIZE = 512
+
+    def __init__(self, cache_path: str | None = None) -> None:
+        self.pattern = re.compile(
+            b"|".join(
+                b"(?P<%s>.{%d}%s)" % (name.encode(), offset, magic)
+                for name, offset, magic, _, _ in MAGIC_SIGNATURES
+            ),
+            re.DOTALL,
+        )
+        self.signatures = {
+            name: (extension, strong)
+            for name, _, _, extension, strong in MAGIC_SIGNATURES
+        }
+        self.cache_path = cache_path
+        self.cache: dict[str, str] = {}  # key -> signature name, "" if none
+        self.seen: dict[str, str] = {}
+        self.reads = 0
+        if cache_path:
+            try:
+                with open(cache_path) as f:
+                    self.cache = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+    def save(self) -> None:
+        """Persist the results of this run, dropping files no longer seen."""
+        if not self.cache_path:
+            return
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.seen, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def identify(self, header: bytes) -> str:
+        match = self.pattern.match(header)
+        return match.lastgroup if match else ""
+
+    def sniff(self, path: str) -> tuple[str, bool] | None:
+        """Return ``(extension, strong)`` of the signature a file matches."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = f"{stat.st_dev}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+
+        name = self.cache.get(key)
+        if name is None:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    header = os.pread(fd, self.HEADER_SIZE, 0)
+                finally:
+                    os.close(fd)
+            except OSError:
+                return None
+            self.reads += 1
+            name = self.identify(header)
+        self.seen[key] = name
+        return self.signatures[name] if name else None
+
+
+# Bytes hashed from each end of a file before committing to a full read
+HASH_BLOCK = 64 * 1024
+
+DUPLICATES_DIRECTORY = "duplicates"
+DEDUPE_POLICIES = ("hardlink", "move", "delete")
+
+# Category of files still being downloaded, left alone while watching
+PARTIAL_CATEGORY = "Garbage"
+
+
+def partial_digest(path: str, size: int) -> bytes:
+    """Hash of the first and last ``HASH_BLOCK`` bytes of a file, which
+    covers all of it when it is at most two blocks long."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        data = os.pread(fd, HASH_BLOCK, 0)
+        if size > HASH_BLOCK:
+            data += os.pread(fd, HASH_BLOCK, max(HASH_BLOCK, size - HASH_BLOCK))
+    finally:
+        os.close(fd)
+    return hashlib.blake2b(data).digest()
+
+
+def full_digest(path: str, size: int) -> bytes:
+    digest = hashlib.blake2b()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+class Move(NamedTuple):
+    category: str
+    source: str
+    destination: str
+
+
+def unique_name(filename: str, taken: set[str]) -> str:
+    """``filename``, or ``name (N).ext`` with the smallest free N."""
+    if filename not in taken:
+        return filename
+    suffix = file_suffix(filename)
+    stem = filename[: len(filename) - len(suffix)]
+    number = 1
+    while f"{stem} ({number}){suffix}" in taken:
+        number += 1
+    return f"{stem} ({number}){suffix}"
+
+
+class MoveJournal:
+    """Append-only record of a sorting run.
+
+    A journal starts with a header naming the folder and the whole move
+    plan, synced to disk before the first file is moved. Each finished
+    move then appends a ``moved`` or ``failed`` line, and each move rolled
+    back an ``undone`` line. Result lines are synced in batches, so a
+    crash loses at most the last batch; moves in it are recognised on
+    resume because their source is gone and their destination exists.
+    """
+
+    SYNC_EVERY = 1000
+    SYNC_INTERVAL = 1.0
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file = open(path, "a", encoding="utf-8")
+        self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def __enter__(self) -> "MoveJournal":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @classmethod
+    def create(cls, path: str, folder: Path, moves: list[Move]) -> "MoveJournal":
+        """Write a new journal holding the plan and open it for results."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(
+                json.dumps({"folder": os.path.abspath(folder), "moves": len(moves)})
+            )
+            f.write("\n")
+            for move in moves:
+                f.write(json.dumps(move._asdict()))
+                f.write("\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return cls(path)
+
+    @staticmethod
+    def read(path: str) -> tuple[str, list[Move], list[tuple[str, int]]]:
+        """Return the folder, the plan and the ``(status, index)`` results
+        of a journal. A line torn by a crash is cut off, so results
+        appended later are not lost behind it."""
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+            moves = [Move(**json.loads(f.readline())) for _ in range(header["moves"])]
+            results = []
+            end = f.tell()
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                results.extend(record.items())
+                end += len(line)
+        if end != os.path.getsize(path):
+            os.truncate(path, end)
+        return header["folder"], moves, results
+
+    def record(self, status: str, index: int) -> None:
+        self.file.write(f'{{"{status}": {index}}}\n')
+        self.pending += 1
+        if (
+            self.pending >= self.SYNC_EVERY
+            or time.monotonic() - self.last_sync >= self.SYNC_INTERVAL
+        ):
+            self.sync()
+
+    def sync(self) -> None:
+        if self.pending:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def close(self) -> None:
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+
+
 class Folder:
     def __init__(self, path: Path | str) -> None:
         self.path = Path(path) if isinstance(path, str) else path
+        self.created_subfolders: set[str] = set()
 
     def _get_subfolder_paths(self) -> Iterable:
         return (folder.path for folder in os.scandir(self.path) if folder.is_dir())
@@ -189,32 +594,579 @@ class Folder:
     def _get_file_paths(self) -> Iterable:
         return (file.path for file in os.scandir(self.path) if not file.is_dir())
 
-    def _create_subfolder(self, subfolder_name: str) -> None:
-        subfolder_path = self.path / subfolder_name
+    def _create_subfolder(self, subfolder_name: str) -> bool:
+        """Create a category directory, at most once per run. Returns False
+        if it cannot be created, e.g. because a file has its name."""
+        if subfolder_name in self.created_subfolders:
+            return True
+        try:
+            (self.path / subfolder_name).mkdir(exist_ok=True)
+        except OSError as ex:
+            logging.error(f"Cannot create {self.path / subfolder_name}: {ex}")
+            return False
+        self.created_subfolders.add(subfolder_name)
+        return True
 
-        if not subfolder_path.exists():
-            subfolder_path.mkdir()
+    def _iter_files(self, recursive: bool, skip: set[str]) -> Iterator[os.DirEntry]:
+        """Yield the files below the folder in sorted order. Top-level
+        directories named in ``skip`` are not descended into."""
+        pending = [str(self.path)]
+        while pending:
+            directory = pending.pop()
+            try:
+                with os.scandir(directory) as iterator:
+                    entries = sorted(iterator, key=lambda entry: entry.name)
+            except OSError as ex:
+                # An unreadable or vanished directory must not end the run
+                logging.warning(f"Skipping directory {directory}: {ex}")
+                continue
+            subdirectories = []
+            for entry in entries:
+                if not entry.is_dir():
+                    yield entry
+                elif (
+                    recursive
+                    and not entry.is_symlink()
+                    and (directory != str(self.path) or entry.name not in skip)
+                ):
+                    subdirectories.append(entry.path)
+            pending.extend(reversed(subdirectories))
 
-    def sort_files_by_extensions(self) -> None:
-        for name, ext_data in EXTENSIONS.items():
-            for filepath in self._get_file_paths():
-                path = Path(filepath)
-                extension = path.suffix
+    def classify(
+        self,
+        path: str,
+        index: ExtensionIndex,
+        sniffer: MagicSniffer | None = None,
+    ) -> tuple[str, str] | None:
+        """Category of a file by extension, corrected by its content when
+        a ``sniffer`` is given. Partial downloads keep their category: a
+        ``.part`` file starts like the file it will become."""
+        category = index.lookup(os.path.basename(path))
+        if sniffer is None or (category and category[0] == PARTIAL_CATEGORY):
+            return category
 
-                if extension in ext_data["exts"] or "*" in ext_data["exts"]:
-                    subfolder_name = Path(ext_data["directory_name"])
-                    self._create_subfolder(subfolder_name)
+        sniffed = sniffer.sniff(path)
+        if sniffed is None:
+            return category
+        extension, strong = sniffed
+        if strong or category is None or category == index.fallback:
+            return index.lookup_extension(extension) or category
+        return category
 
-                    try:
-                        new_path = Path(self.path, subfolder_name, path.name)
-                        logging.info(
-                            f"[{name}] {path.name} -> {'/'.join(new_path.parts[-2:])}"
-                        )
-                        path.rename(new_path)
-                    except Exception as ex:
-                        logging.exception(
-                            f"Error raised when working with {self.path}: {ex}"
+    def plan_moves(
+        self,
+        index: ExtensionIndex,
+        recursive: bool = False,
+        sniffer: MagicSniffer | None = None,
+    ) -> list[Move]:
+        """Decide where every file goes before anything is moved.
+
+        Names are assigned in sorted source order: a file whose name is
+        already taken in its category directory, by an existing file or
+        by an earlier move, gets the first free ``name (N).ext``. Plans
+        therefore do not depend on the order moves finish in.
+        """
+        # Duplicates set aside by --dedupe move must not be sorted back
+        category_dirs = {directory for _, directory in index.categories.values()}
+        category_dirs.add(DUPLICATES_DIRECTORY)
+        if index.fallback is not None:
+            category_dirs.add(index.fallback[1])
+
+        taken: dict[str, set[str]] = {}
+        moves = []
+        for entry in self._iter_files(recursive, category_dirs):
+            category = self.classify(entry.path, index, sniffer)
+            if category is not None:
+                moves.append(self.plan_move(entry.path, category, taken))
+        return moves
+
+    def plan_move(
+        self, source: str, category: tuple[str, str], taken: dict[str, set[str]]
+    ) -> Move:
+        """Move of one file into its category directory, reserving its new
+        name in ``taken``, which maps category directories to the names
+        used in them and is filled from disk on first use."""
+        name, subfolder_name = category
+        if subfolder_name not in taken:
+            try:
+                taken[subfolder_name] = set(
+                    os.listdir(os.path.join(self.path, subfolder_name))
+                )
+            except OSError:
+                # Missing, or not a directory: creating it reports the latter
+                taken[subfolder_name] = set()
+        target = unique_name(os.path.basename(source), taken[subfolder_name])
+        taken[subfolder_name].add(target)
+        return Move(name, source, os.path.join(self.path, subfolder_name, target))
+
+    def _relative(self, path: str) -> str:
+        """``os.path.relpath`` for paths below the folder, without its
+        system calls and normalisation."""
+        return path.removeprefix(f"{self.path}{os.sep}")
+
+    def _move(self, move: Move, level: int = logging.DEBUG) -> bool:
+        try:
+            self._rename(move, level)
+        except Exception as ex:
+            logging.exception(f"Error raised when working with {self.path}: {ex}")
+            return False
+        return True
+
+    def _rename(self, move: Move, level: int = logging.DEBUG) -> None:
+        os.rename(move.source, move.destination)
+        # By default per-file records only reach the log file and event log
+        logging.log(
+            level,
+            "[%s] %s -> %s",
+            move.category,
+            self._relative(move.source),
+            self._relative(move.destination),
+            extra={"event": {"event": "move", **move._asdict()}},
+        )
+
+    def execute_moves(
+        self,
+        moves: list[Move],
+        jobs: int = 1,
+        journal: MoveJournal | None = None,
+        indices: list[int] | None = None,
+    ) -> int:
+        """Create the destination folders, then carry out the moves on
+        ``jobs`` threads, recording each result in the ``journal`` under
+        its index in the plan. At most ``jobs * 4`` moves are in flight at
+        once. Moves into a folder that cannot be created count as failed.
+        Returns the number of files moved."""
+        blocked = {
+            subfolder_name
+            for subfolder_name in sorted(
+                {os.path.basename(os.path.dirname(move.destination)) for move in moves}
+            )
+            if not self._create_subfolder(subfolder_name)
+        }
+
+        start = time.perf_counter()
+        last_report = start
+        moved = 0
+        done = 0
+        max_pending = jobs * 4
+        pending: deque[Future] = deque()
+
+        def collect() -> None:
+            nonlocal moved, done, last_report
+            ok = pending.popleft().result()
+            moved += ok
+            if journal is not None:
+                index = indices[done] if indices is not None else done
+                journal.record("moved" if ok else "failed", index)
+            done += 1
+            now = time.perf_counter()
+            if now - last_report >= 1:
+                last_report = now
+                logging.info(
+                    f"Progress: {done}/{len(moves)} files, "
+                    f"{done / (now - start):.0f} files/s"
+                )
+
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            for move in moves:
+                if os.path.basename(os.path.dirname(move.destination)) in blocked:
+                    future: Future = Future()
+                    future.set_result(False)
+                else:
+                    future = executor.submit(self._move, move)
+                pending.append(future)
+                if len(pending) >= max_pending:
+                    collect()
+
+            while pending:
+                collect()
+
+        elapsed = time.perf_counter() - start
+        rate = f", {moved / elapsed:.0f} files/s" if moved and elapsed else ""
+        logging.info(
+            f"Moved {moved} files ({len(moves) - moved} failed) in {elapsed:.2f}s{rate}"
+        )
+        return moved
+
+    def _sort_landed(
+        self,
+        paths: Iterable[str],
+        index: ExtensionIndex,
+        taken: dict[str, set[str]],
+        sniffer: MagicSniffer | None = None,
+    ) -> int:
+        """Move files that just appeared in the folder, skipping partial
+        downloads. Returns the number of files moved."""
+        moved = 0
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # Already gone, or renamed again in the same burst
+            # Browsers create an empty placeholder under the final name and
+            # rename the finished download over it later
+            if not S_ISREG(stat.st_mode) or not stat.st_size:
+                continue
+
+            # Decided by extension alone, before any content is sniffed
+            category = index.lookup(os.path.basename(path))
+            if category is not None and category[0] == PARTIAL_CATEGORY:
+                continue
+            category = self.classify(path, index, sniffer)
+            if category is None:
+                continue
+            move = self.plan_move(path, category, taken)
+            if os.path.exists(move.destination):
+                # Someone else wrote into the category directory, re-read it
+                del taken[category[1]]
+                move = self.plan_move(path, category, taken)
+
+            if not self._create_subfolder(category[1]):
+                continue
+            try:
+                self._rename(move, logging.INFO)
+            except FileNotFoundError:
+                if not os.path.lexists(path):
+                    continue  # Gone before it could be moved
+                # The category directory was removed while watching: forget
+                # it, create it again and retry once
+                self.created_subfolders.discard(category[1])
+                taken.pop(category[1], None)
+                move = self.plan_move(path, category, taken)
+                if self._create_subfolder(category[1]):
+                    moved += self._move(move, logging.INFO)
+                continue
+            except OSError as ex:
+                logging.exception(f"Error raised when working with {self.path}: {ex}")
+                continue
+            moved += 1
+        return moved
+
+    def watch(
+        self,
+        extensions: dict | None = None,
+        sniffer: MagicSniffer | None = None,
+        debounce: float = 0.2,
+    ) -> None:
+        """Sort the files already in the folder, then sort every file that
+        lands in it until interrupted.
+
+        Files are picked up when closed after writing or renamed into the
+        folder, which is how browsers finish a ``.part`` or
+        ``.crdownload`` download. The extension index and the names taken
+        in each category directory stay in memory, so handling a file
+        costs a few system calls besides the rename.
+        """
+        index = ExtensionIndex(EXTENSIONS if extensions is None else extensions)
+        taken: dict[str, set[str]] = {}
+
+        with Inotify() as inotify:
+            # Watch first, so files landing during the initial pass are not missed
+            inotify.add_watch(str(self.path), IN_CLOSE_WRITE | IN_MOVED_TO)
+            self._sort_landed(
+                (entry.path for entry in self._iter_files(False, set())),
+                index,
+                taken,
+                sniffer,
+            )
+            logging.info(f"Watching {self.path} for new files, press Ctrl+C to stop")
+            try:
+                while True:
+                    events = inotify.read_batch(debounce)
+                    if any(event.mask & IN_Q_OVERFLOW for event in events):
+                        paths = [entry.path for entry in self._iter_files(False, set())]
+                    else:
+                        paths = list(
+                            dict.fromkeys(
+                                event.path
+                                for event in events
+                                if not event.mask & IN_ISDIR
+                            )
                         )
+                    if paths:
+                        self._sort_landed(paths, index, taken, sniffer)
+            except KeyboardInterrupt:
+                logging.info("Stopped watching.")
+
+        if sniffer is not None:
+            sniffer.save()
+
+    def _hash_groups(
+        self,
+        groups: list[list[tuple[str, os.stat_result]]],
+        digest,
+        jobs: int,
+    ) -> list[list[tuple[str, os.stat_result]]]:
+        """Split every group by ``digest(path, size)`` of its files, hashed
+        on ``jobs`` threads with at most ``jobs * 4`` files in flight,
+        keeping subgroups of two or more files."""
+
+        def hash_file(file: tuple[str, os.stat_result]) -> bytes | None:
+            try:
+                return digest(file[0], file[1].st_size)
+            except OSError as ex:
+                logging.warning(f"Skipping {file[0]}: {ex}")
+                return None
+
+        subgroups: dict[tuple[int, bytes], list[tuple[str, os.stat_result]]] = {}
+        max_pending = jobs * 4
+        pending: deque[tuple[tuple[str, os.stat_result], Future]] = deque()
+
+        def collect() -> None:
+            file, future = pending.popleft()
+            file_digest = future.result()
+            if file_digest is not None:
+                subgroups.setdefault((file[1].st_size, file_digest), []).append(file)
+
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            for group in groups:
+                for file in group:
+                    pending.append((file, executor.submit(hash_file, file)))
+                    if len(pending) >= max_pending:
+                        collect()
+
+            while pending:
+                collect()
+        return [group for group in subgroups.values() if len(group) > 1]
+
+    def find_duplicates(self, jobs: int = 1) -> list[list[str]]:
+        """Group identical files anywhere below the folder.
+
+        Files are grouped by size, then by a hash of their first and last
+        blocks, and only files still sharing both are read in full, so
+        most files are never read at all. Empty files, symlinks and extra
+        hard links to an already seen file are left out. The file to keep,
+        the oldest one, comes first in each group.
+        """
+        by_size: dict[int, list[tuple[str, os.stat_result]]] = {}
+        inodes = set()
+        for entry in self._iter_files(True, {DUPLICATES_DIRECTORY}):
+            try:
+                if entry.is_symlink():
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            if not stat.st_size or (stat.st_dev, stat.st_ino) in inodes:
+                continue
+            inodes.add((stat.st_dev, stat.st_ino))
+            by_size.setdefault(stat.st_size, []).append((entry.path, stat))
+
+        groups = [group for group in by_size.values() if len(group) > 1]
+        candidates = sum(map(len, groups))
+        groups = self._hash_groups(groups, partial_digest, jobs)
+
+        # Up to two blocks the partial hash already covered the whole file
+        small = [group for group in groups if group[0][1].st_size <= 2 * HASH_BLOCK]
+        large = [group for group in groups if group[0][1].st_size > 2 * HASH_BLOCK]
+        read_fully = sum(map(len, large))
+        groups = small + self._hash_groups(large, full_digest, jobs)
+        logging.info(
+            f"Scanned {len(inodes)} files: {candidates} share a size, "
+            f"{read_fully} read in full"
+        )
+
+        return sorted(
+            [
+                path
+                for path, _ in sorted(
+                    group, key=lambda file: (file[1].st_mtime_ns, file[0])
+                )
+            ]
+            for group in groups
+        )
+
+    def _remove_duplicate(
+        self, original: str, duplicate: str, policy: str, taken: set[str]
+    ) -> bool:
+        relative = self._relative(duplicate)
+        destination = None
+        try:
+            if policy == "hardlink":
+                # Link next to the duplicate first, so it is replaced atomically
+                temporary = f"{duplicate}.dedupe-tmp"
+                os.link(original, temporary)
+                os.replace(temporary, duplicate)
+                outcome = "hard link"
+            elif policy == "move":
+                target = unique_name(os.path.basename(duplicate), taken)
+                taken.add(target)
+                destination = os.path.join(self.path, DUPLICATES_DIRECTORY, target)
+                os.rename(duplicate, destination)
+                outcome = f"{DUPLICATES_DIRECTORY}/{target}"
+            else:
+                os.remove(duplicate)
+                outcome = "deleted"
+            logging.debug(
+                "[Duplicate] %s => %s",
+                relative,
+                outcome,
+                extra={
+                    "event": {
+                        "event": "dedupe",
+                        "policy": policy,
+                        "original": original,
+                        "source": duplicate,
+                        "destination": destination,
+                    }
+                },
+            )
+            return True
+        except OSError as ex:
+            if ex.errno == errno.EXDEV:
+                logging.warning(f"Cannot hard link {relative} across file systems")
+            else:
+                logging.exception(f"Error raised when working with {self.path}: {ex}")
+            return False
+
+    def dedupe(self, policy: str = "hardlink", jobs: int = 1) -> int:
+        """Replace every duplicate found by :meth:`find_duplicates` with a
+        hard link to the file kept, move it to the ``duplicates`` folder or
+        delete it. Returns the number of duplicates handled."""
+        if policy not in DEDUPE_POLICIES:
+            raise ValueError(f"Unknown dedupe policy: {policy}")
+
+        start = time.perf_counter()
+        groups = self.find_duplicates(jobs)
+
+        taken: set[str] = set()
+        if policy == "move" and groups:
+            if not self._create_subfolder(DUPLICATES_DIRECTORY):
+                return 0
+            taken = set(os.listdir(os.path.join(self.path, DUPLICATES_DIRECTORY)))
+
+        handled = failed = freed = 0
+        for original, *duplicates in groups:
+            size = os.path.getsize(original)
+            for duplicate in duplicates:
+                if self._remove_duplicate(original, duplicate, policy, taken):
+                    handled += 1
+                    freed += size
+                else:
+                    failed += 1
+
+        elapsed = time.perf_counter() - start
+        logging.info(
+            f"Deduplicated {handled} files ({failed} failed) in {len(groups)} "
+            f"groups, freeing {freed / (1 << 20):.1f} MiB in {elapsed:.2f}s"
+        )
+        return handled
+
+    def sort_files_by_extensions(
+        self,
+        extensions: dict | None = None,
+        recursive: bool = False,
+        jobs: int = 1,
+        sniffer: MagicSniffer | None = None,
+        journal_path: str | None = None,
+    ) -> None:
+        """Move every file into the directory of its category in a single
+        scan of the folder, or of the whole tree below it if ``recursive``.
+
+        Category directories are always created directly in the folder.
+        With a ``journal_path`` the plan and every move are journaled, so
+        the run can be resumed or undone.
+        """
+        index = ExtensionIndex(EXTENSIONS if extensions is None else extensions)
+        moves = self.plan_moves(index, recursive, sniffer)
+        if sniffer is not None:
+            sniffer.save()
+            logging.info(f"Read headers of {sniffer.reads} files")
+        if journal_path is None:
+            self.execute_moves(moves, jobs)
+            return
+        with MoveJournal.create(journal_path, self.path, moves) as journal:
+            self.execute_moves(moves, jobs, journal)
+
+    def _read_journal(
+        self, journal_path: str
+    ) -> tuple[list[Move], list[tuple[str, int]]]:
+        folder, moves, results = MoveJournal.read(journal_path)
+        if folder != os.path.abspath(self.path):
+            raise ValueError(f"Journal {journal_path} belongs to {folder}")
+        return moves, results
+
+    def resume_moves(self, journal_path: str, jobs: int = 1) -> int:
+        """Carry out the moves of a journaled run that have no result yet,
+        without scanning the folder again. Returns the number of files
+        moved."""
+        moves, results = self._read_journal(journal_path)
+        finished = {index for _, index in results}
+
+        indices = []
+        with MoveJournal(journal_path) as journal:
+            for index, move in enumerate(moves):
+                if index in finished:
+                    continue
+                # Moved just before a crash, with its result not yet synced
+                if not os.path.lexists(move.source) and os.path.lexists(
+                    move.destination
+                ):
+                    journal.record("moved", index)
+                else:
+                    indices.append(index)
+            logging.info(
+                f"Resuming {len(indices)} of {len(moves)} planned moves "
+                f"from {journal_path}"
+            )
+            return self.execute_moves(
+                [moves[index] for index in indices], jobs, journal, indices
+            )
+
+    def undo_moves(self, journal_path: str) -> int:
+        """Move the files of a journaled run back, newest move first.
+        Files whose old name has been taken again are left in place.
+        Returns the number of files restored."""
+        moves, results = self._read_journal(journal_path)
+        undone = {index for status, index in results if status == "undone"}
+        to_undo = [
+            index
+            for status, index in reversed(results)
+            if status == "moved" and index not in undone
+        ]
+
+        start = time.perf_counter()
+        restored = skipped = 0
+        with MoveJournal(journal_path) as journal:
+            for index in to_undo:
+                move = moves[index]
+                relative = self._relative(move.destination)
+                if os.path.lexists(move.source):
+                    logging.warning(f"Not restoring {relative}: source name is taken")
+                    skipped += 1
+                    continue
+                try:
+                    os.makedirs(os.path.dirname(move.source), exist_ok=True)
+                    os.rename(move.destination, move.source)
+                except OSError as ex:
+                    logging.exception(
+                        f"Error raised when working with {self.path}: {ex}"
+                    )
+                    continue
+                logging.debug(
+                    "[Undo] %s -> %s",
+                    relative,
+                    self._relative(move.source),
+                    extra={"event": {"event": "undo", **move._asdict()}},
+                )
+                journal.record("undone", index)
+                restored += 1
+
+        # Drop category folders the run created and left empty
+        for directory in sorted(
+            {os.path.dirname(moves[i].destination) for i in to_undo}
+        ):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                pass
+
+        elapsed = time.perf_counter() - start
+        logging.info(
+            f"Restored {restored} files ({skipped} skipped, "
+            f"{len(to_undo) - restored - skipped} failed) in {elapsed:.2f}s"
+        )
+        return restored
 
 
 def main():
@@ -227,16 +1179,116 @@ def main():
         help="Input dir for sorting",
         default=f"{os.getenv('HOME')}/Downloads",
     )
+    parser.add_argument(
+        "--recursive",
+        action="store_true",
+        help="Also sort files in subdirectories into the top-level categories",
+    )
+    parser.add_argument(
+        "--sniff",
+        action="store_true",
+        help="Also classify files by their first bytes, catching files with a "
+        "missing or wrong extension",
+    )
+    parser.add_argument(
+        "--dedupe",
+        choices=DEDUPE_POLICIES,
+        default=None,
+        help="Instead of sorting, find identical files anywhere in the "
+        "directory and hard link, move or delete all but the oldest copy",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and sort files as they land in the directory",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=0.2,
+        help="Seconds without new events before a burst is handled in --watch mode",
+    )
+    parser.add_argument(
+        "--journal",
+        default=".file_sorter_journal.ndjson",
+        help="Journal of the moves of a sorting run, used by --resume and --undo",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Finish an interrupted sorting run from its journal",
+    )
+    parser.add_argument(
+        "--undo",
+        action="store_true",
+        help="Move the files of the journaled sorting run back",
+    )
+    parser.add_argument(
+        "--event-log",
+        metavar="FILE",
+        default=None,
+        help="Also append every move as a JSON line to this file, for auditing",
+    )
+    parser.add_argument(
+        "--verbose",
+        "-v",
+        action="store_true",
+        help="Print every moved file, not only progress and errors",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of threads moving files, useful on network storage",
+    )
 
     args = parser.parse_args()
 
+    with LogWriter(
+        ".file_sorter.log",
+        logging.DEBUG if args.verbose else logging.INFO,
+        args.event_log,
+    ):
+        run(parser, args)
+
+
+def run(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
     folder_path = args.dir
 
     folder = Folder(folder_path)
 
+    if args.dedupe:
+        logging.info(f"Deduplicating files in {folder_path}")
+        folder.dedupe(args.dedupe, jobs=max(1, args.jobs))
+        return
+
+    if args.resume or args.undo:
+        try:
+            if args.undo:
+                logging.info(f"Undoing moves journaled in {args.journal}")
+                folder.undo_moves(args.journal)
+            else:
+                folder.resume_moves(args.journal, jobs=max(1, args.jobs))
+        except (OSError, ValueError) as ex:
+            # Logged rather than printed, so it follows the queued records
+            logging.error(f"Cannot use journal {args.journal}: {ex}")
+            raise SystemExit(2) from ex
+        return
+
+    sniffer = MagicSniffer(".file_sorter_magic.json") if args.sniff else None
+    if args.watch:
+        logging.info(f"Watching {folder_path}")
+        folder.watch(sniffer=sniffer, debounce=args.debounce)
+        return
+
     logging.info(f"Sorting files by extensions in {folder_path}")
-    print()
-    folder.sort_files_by_extensions()
+    folder.sort_files_by_extensions(
+        recursive=args.recursive,
+        jobs=max(1, args.jobs),
+        sniffer=sniffer,
+        journal_path=args.journal,
+    )
 
 
 if __name__ == "__main__":
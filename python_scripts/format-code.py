@@ -1,7 +1,13 @@
 #!/usr/bin/env python3
+import argparse
+import hashlib
+import json
 import os
+import subprocess
 import sys
 
+from tree_walk import argv_batches, file_digest, walk_files
+
 # Define color codes for output
 RED = "\033[31m"
 GREEN = "\033[32m"
@@ -50,28 +56,199 @@ def file_exists(file_path):
     return True
 
 
-def main():
-    os.system("isort .")
-    os.system("black .")
-
-    if len(sys.argv) > 1:
-        print(f"{BOLD}Format {sys.argv[1]}{NC}")
-        os.system(f"{RUFF} check {sys.argv[1]} --fix")
-        os.system(f"{RUFF} format {sys.argv[1]}")
-        print(f"{GREEN}Formatting completed successfully: {sys.argv[1]}{NC}")
-        return
-
-    for root, _dirs, files in os.walk(os.getcwd()):
-        if len(set(root.split("/")).intersection(IGNORED_DIRS)) > 0:
+def find_python_files(root_dir):
+    """Collect Python files once, skipping ignored directories."""
+    return list(walk_files(root_dir, IGNORED_DIRS, py_extensions))
+
+
+def staged_python_files():
+    """Python files added, copied, modified or renamed in the git index."""
+    result = subprocess.run(
+        [
+            "git",
+            "diff",
+            "--cached",
+            "--name-only",
+            "--relative",
+            "--diff-filter=ACMR",
+            "-z",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return [
+        path
+        for path in result.stdout.split("\0")
+        if path.endswith(py_extensions)
+        and not set(path.split("/")[:-1]).intersection(IGNORED_DIRS)
+    ]
+
+
+MISSING_TOOLS = set()
+
+
+def run_tool(command, **kwargs):
+    """Run a tool, or return None if it cannot be started, reporting each
+    missing tool once."""
+    try:
+        return subprocess.run(command, check=False, **kwargs)
+    except OSError as e:
+        if command[0] not in MISSING_TOOLS:
+            MISSING_TOOLS.add(command[0])
+            print_error(f"Cannot run {command[0]}: {e}")
+        return None
+
+
+def run_batched(command, files):
+    """Run a tool over files in as few calls as the command line allows,
+    returning the files of batches that failed. A missing tool fails
+    every file."""
+    failed = []
+    for batch in argv_batches(files):
+        result = run_tool([*command, *batch])
+        if result is None:
+            return list(files)
+        if result.returncode != 0:
+            failed += batch
+    return failed
+
+
+def ruff_check(files):
+    """Run ``ruff check --fix`` over files in batches, returning the files
+    left with violations. A missing ruff leaves every file."""
+    remaining = set()
+    for batch in argv_batches(files):
+        result = run_tool(
+            [RUFF, "check", "--fix", "--output-format", "json", *batch],
+            capture_output=True,
+            text=True,
+        )
+        if result is None:
+            return set(files)
+        try:
+            violations = json.loads(result.stdout or "[]")
+        except ValueError:
+            print_error(result.stderr.strip() or "ruff check failed")
+            remaining.update(batch)
             continue
+        for violation in violations:
+            path = os.path.relpath(violation["filename"])
+            print(
+                f"{YELLOW}{path}:{violation['location']['row']}: "
+                f"{violation['code']} {violation['message']}{NC}"
+            )
+            remaining.add(os.path.normpath(path))
+    return {file for file in files if os.path.normpath(file) in remaining}
+
+
+def tool_versions():
+    versions = []
+    for tool in ("isort", "black", RUFF):
+        try:
+            result = subprocess.run(
+                [tool, "--version"], capture_output=True, text=True, check=False
+            )
+            versions.append(result.stdout.strip())
+        except OSError:
+            versions.append("unavailable")
+    return hashlib.sha256("\n".join(versions).encode()).hexdigest()
+
+
+def load_manifest(manifest_path, versions):
+    """Digests of files left clean by the last successful run."""
+    try:
+        with open(manifest_path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data.get("files", {}) if data.get("versions") == versions else {}
+
+
+def save_manifest(manifest_path, versions, manifest):
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"versions": versions, "files": manifest}, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def format_files(files, manifest=None):
+    """Run isort, black and ruff over files with a few batched calls each.
+
+    Files whose digest matches ``manifest`` are skipped; the manifest is
+    updated with every file all tools left clean.
+    """
+    if manifest is not None:
+        digests = {file: file_digest(file) for file in files}
+        files = [file for file in files if manifest.get(file) != digests[file]]
+        print(f"{YELLOW}Skipping {len(digests) - len(files)} unchanged files{NC}")
+    if not files:
+        return []
+
+    print(f"{BOLD}Format {len(files)} files{NC}")
+    failed = set(run_batched(["isort"], files))
+    failed.update(run_batched(["black"], files))
+    failed.update(ruff_check(files))
+    failed.update(run_batched([RUFF, "format"], files))
+
+    if manifest is not None:
         for file in files:
-            if file.endswith(py_extensions):
-                print(f"{BOLD}Format {file}: {root}/{file}{NC}")
-                os.system(f"{RUFF} check {root}/{file} --fix")
-                os.system(f"{RUFF} format {root}/{file}")
-                print(f"{GREEN}Formatting completed successfully: {root}/{file}{NC}")
+            if file in failed:
+                manifest.pop(file, None)
+            else:
+                manifest[file] = file_digest(file)
+    return sorted(failed)
 
-    os.system("ruff clean")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Format Python files with isort, black and ruff"
+    )
+    parser.add_argument(
+        "path",
+        nargs="?",
+        default=None,
+        help="File or directory to format (default: current directory)",
+    )
+    parser.add_argument(
+        "--staged", action="store_true", help="Only format files staged in git"
+    )
+    parser.add_argument(
+        "--manifest",
+        nargs="?",
+        const=".format_code_manifest.json",
+        default=None,
+        help="Skip files unchanged since they were last formatted cleanly",
+    )
+    args = parser.parse_args()
+
+    if args.path and os.path.isdir(args.path):
+        files = find_python_files(args.path)
+    elif args.path:
+        if not file_exists(args.path):
+            sys.exit(1)
+        files = [args.path]
+    elif args.staged:
+        files = staged_python_files()
+    else:
+        files = find_python_files(".")
+    # The walk yields ./pkg/a.py and git pkg/a.py: manifest keys must agree
+    files = [os.path.normpath(file) for file in files]
+
+    versions = tool_versions() if args.manifest else None
+    manifest = load_manifest(args.manifest, versions) if args.manifest else None
+    failed = format_files(files, manifest)
+    if args.manifest:
+        if not args.path and not args.staged:
+            # Forget files deleted since the last run
+            manifest = {file: manifest[file] for file in files if file in manifest}
+        save_manifest(args.manifest, versions, manifest)
+
+    run_tool([RUFF, "clean"])
+    if failed:
+        print_error(f"{len(failed)} files still need attention: {' '.join(failed)}")
+    else:
+        print(f"{GREEN}Formatting completed successfully: {len(files)} files{NC}")
 
 
 if __name__ == "__main__":
@@ -1,32 +1,293 @@
 import argparse
+import hashlib
+import json
+import math
 import os
+import re
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
-count = 0
+from tree_walk import argv_batches, file_digest, walk_files
 
+STYLE_FILE_NAMES = (".clang-format", "_clang-format")
+SOURCE_EXTENSIONS = (".c", ".cpp", ".h", ".hpp", ".cc", ".cxx", ".hh")
 
-def find_source_files(root_dir, ignore_dirs):
-    source_files = []
-    for dirpath, dirnames, filenames in os.walk(root_dir):
-        dirnames[:] = [d for d in dirnames if d not in ignore_dirs]
+HUNK_PATTERN = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+QUOTED_CHAR_PATTERN = re.compile(r"\\(?:([0-7]{3})|(.))")
+QUOTED_CHARS = {"a": 7, "b": 8, "t": 9, "n": 10, "v": 11, "f": 12, "r": 13}
 
-        for filename in filenames:
-            if filename.endswith((".c", ".cpp", ".h", ".hpp", ".cc", ".cxx", ".hh")):
-                source_files.append(os.path.join(dirpath, filename))
-    return source_files
 
+class FormatCache:
+    """Remembers files that are already formatted.
 
-def format_files(files, clang_format, style):
-    global count
+    An entry holds the content hash of a file right after it was formatted
+    and the hash of the style it was formatted with. Files with the same
+    size and mtime are trusted without being read; the whole cache is
+    dropped when the clang-format version or ``--style`` changes.
+    """
 
-    for file in files:
+    def __init__(self, cache_path, clang_format, style):
+        self.cache_path = cache_path
+        self.style = style
+        self.salt = f"{clang_format_version(clang_format)}\n{style}"
+        self.entries = {}
+        self.style_hashes = {}  # directory -> hash of the style in effect
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.cache_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("salt") == self.salt:
+            self.entries = data.get("entries", {})
+
+    def save(self):
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"salt": self.salt, "entries": self.entries}, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def style_hash(self, path):
+        """Hash of the style clang-format resolves for a file: the nearest
+        .clang-format above it for ``--style file``, else the style itself."""
+        if self.style != "file":
+            return hashlib.sha256(self.style.encode()).hexdigest()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        visited = []
+        style_hash = ""
+        while directory not in self.style_hashes:
+            visited.append(directory)
+            style_file = next(
+                (
+                    os.path.join(directory, name)
+                    for name in STYLE_FILE_NAMES
+                    if os.path.isfile(os.path.join(directory, name))
+                ),
+                None,
+            )
+            if style_file is not None:
+                style_hash = file_digest(style_file)
+                break
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                break
+            directory = parent
+        else:
+            style_hash = self.style_hashes[directory]
+
+        for directory in visited:
+            self.style_hashes[directory] = style_hash
+        return style_hash
+
+    def is_formatted(self, path, stat=None):
+        entry = self.entries.get(os.path.abspath(path))
+        if entry is None or entry["style"] != self.style_hash(path):
+            return False
         try:
-            cmd = [clang_format, "-i", "--style", style, file]
-            subprocess.run(cmd, check=True)
-            print(f"\033[32mFormatted:\033[0m {file}")
-            count += 1
-        except subprocess.CalledProcessError as e:
-            print(f"\033[31mError formatting {file}:\033[0m {e}")
+            stat = stat or os.stat(path)
+            if (stat.st_size, stat.st_mtime_ns) != (entry["size"], entry["mtime"]):
+                if file_digest(path) != entry["digest"]:
+                    return False
+                entry["size"], entry["mtime"] = stat.st_size, stat.st_mtime_ns
+        except OSError:
+            return False
+        return True
+
+    def add(self, path):
+        try:
+            stat = os.stat(path)
+            digest = file_digest(path)
+        except OSError:
+            return
+        self.entries[os.path.abspath(path)] = {
+            "digest": digest,
+            "style": self.style_hash(path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+        }
+
+    def prune(self, live_paths):
+        """Forget files that were not found in this run."""
+        live = {os.path.abspath(path) for path in live_paths}
+        self.entries = {
+            path: entry for path, entry in self.entries.items() if path in live
+        }
+
+
+def clang_format_version(clang_format):
+    try:
+        result = subprocess.run(
+            [clang_format, "--version"], capture_output=True, text=True, check=False
+        )
+    except OSError:
+        return "unavailable"
+    return result.stdout.strip()
+
+
+def find_source_files(root_dir, ignore_dirs, jobs=1, with_stat=False):
+    return list(
+        walk_files(
+            root_dir, ignore_dirs, SOURCE_EXTENSIONS, with_stat=with_stat, jobs=jobs
+        )
+    )
+
+
+def unquote_diff_path(path):
+    """Undo git's quoting of a path in a diff header.
+
+    Names containing a space get a trailing tab. Names with control
+    characters, quotes, backslashes or non-ASCII bytes are put in double
+    quotes with C escapes.
+    """
+    path = path.rstrip("\t")
+    if not (len(path) >= 2 and path.startswith('"') and path.endswith('"')):
+        return path
+
+    def unescape(match):
+        octal, char = match.groups()
+        if octal:
+            return chr(int(octal, 8))
+        return chr(QUOTED_CHARS.get(char, ord(char)))
+
+    # Octal escapes are bytes of the UTF-8 name, collected as latin-1 first
+    raw = QUOTED_CHAR_PATTERN.sub(unescape, path[1:-1])
+    return raw.encode("latin-1").decode("utf-8", "surrogateescape")
+
+
+def changed_line_ranges(root_dir, ref, ignore_dirs):
+    """Map every source file under ``root_dir`` changed since ``ref`` to the
+    ``(first, last)`` line ranges added or modified in it."""
+    # Explicit prefixes: diff.noprefix or diff.mnemonicPrefix would
+    # otherwise change the "+++ b/" lines parsed below
+    result = subprocess.run(
+        [
+            "git",
+            "diff",
+            "-U0",
+            "--no-color",
+            "--no-ext-diff",
+            "--relative",
+            "--src-prefix=a/",
+            "--dst-prefix=b/",
+            ref,
+        ],
+        cwd=root_dir,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    ranges = {}
+    file = None
+    for line in result.stdout.splitlines():
+        if line.startswith("+++ "):
+            path = unquote_diff_path(line[4:])
+            file = None
+            if path.startswith("b/") and path.endswith(SOURCE_EXTENSIONS):
+                path = path[2:]
+                if not set(path.split("/")[:-1]) & set(ignore_dirs):
+                    file = os.path.join(root_dir, path)
+            continue
+
+        match = HUNK_PATTERN.match(line)
+        if file is None or match is None:
+            continue
+        start = int(match.group(1))
+        length = int(match.group(2) or 1)
+        if length:  # Pure deletions leave no lines to format
+            ranges.setdefault(file, []).append((start, start + length - 1))
+    return ranges
+
+
+def format_ranges(file_ranges, clang_format, style, jobs=1):
+    """Format only the given line ranges of each file, returning the number
+    of formatted and failed files.
+
+    clang-format accepts ``--lines`` for a single file only, so every file
+    gets its own run; ``jobs`` runs go in parallel.
+    """
+
+    def format_file(item):
+        file, ranges = item
+        cmd = [clang_format, "-i", "--style", style]
+        cmd += [f"--lines={first}:{last}" for first, last in ranges]
+        result = subprocess.run(
+            [*cmd, file], capture_output=True, text=True, check=False
+        )
+        return file, result
+
+    formatted_count = failed_count = 0
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for file, result in executor.map(format_file, sorted(file_ranges.items())):
+            if result.returncode == 0:
+                print(f"\033[32mFormatted:\033[0m {file}")
+                formatted_count += 1
+            else:
+                error = result.stderr.strip() or f"exit code {result.returncode}"
+                print(f"\033[31mError formatting {file}:\033[0m {error}")
+                failed_count += 1
+    return formatted_count, failed_count
+
+
+def format_batch(batch, clang_format, style):
+    """Format a batch in one clang-format run.
+
+    Returns the formatted files and ``(file, error)`` for failed ones. When
+    the run fails, its files are retried one by one to find the culprits.
+    """
+    cmd = [clang_format, "-i", "--style", style, *batch]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=False)
+    if result.returncode == 0:
+        return batch, []
+    if len(batch) == 1:
+        return [], [
+            (batch[0], result.stderr.strip() or f"exit code {result.returncode}")
+        ]
+
+    formatted, failed = [], []
+    for file in batch:
+        file_formatted, file_failed = format_batch([file], clang_format, style)
+        formatted += file_formatted
+        failed += file_failed
+    return formatted, failed
+
+
+def format_files(files, clang_format, style, jobs=1, cache=None, stats=None):
+    """Format files in argv-sized batches across ``jobs`` clang-format
+    processes, returning the number of formatted and failed files.
+
+    Files the ``cache`` knows as formatted are skipped, checked against
+    ``stats`` from the walk when given.
+    """
+    if cache is not None:
+        stats = stats or {}
+        files = [
+            file for file in files if not cache.is_formatted(file, stats.get(file))
+        ]
+    if not files:
+        return 0, 0
+
+    # Several batches per worker keep the pool busy until the end
+    max_files = max(1, math.ceil(len(files) / (jobs * 4)))
+    batches = list(argv_batches(files, max_files))
+
+    formatted_count = failed_count = 0
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for formatted, failed in executor.map(
+            lambda batch: format_batch(batch, clang_format, style), batches
+        ):
+            for file in formatted:
+                print(f"\033[32mFormatted:\033[0m {file}")
+                if cache is not None:
+                    cache.add(file)
+            for file, error in failed:
+                print(f"\033[31mError formatting {file}:\033[0m {error}")
+            formatted_count += len(formatted)
+            failed_count += len(failed)
+    return formatted_count, failed_count
 
 
 def main():
@@ -41,6 +302,27 @@ def main():
     parser.add_argument(
         "--style", default="file", help="Formatting style (file/Google/LLVM/etc.)"
     )
+    parser.add_argument(
+        "--cache",
+        nargs="?",
+        const=".format_cx_cache.json",
+        default=None,
+        help="Skip files recorded as already formatted in this cache file "
+        "(not used with --diff-base)",
+    )
+    parser.add_argument(
+        "--diff-base",
+        metavar="REF",
+        default=None,
+        help="Only format lines changed since this git ref",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of clang-format processes to run in parallel",
+    )
 
     args = parser.parse_args()
 
@@ -50,15 +332,51 @@ def main():
     print(f"\033[33mStyle:\033[0m {args.style}")
     print("\033[36m" + "=" * 30 + "\033[0m")
 
-    source_files = find_source_files(args.root_dir, args.ignore)
+    if args.diff_base:
+        file_ranges = changed_line_ranges(args.root_dir, args.diff_base, args.ignore)
+        if not file_ranges:
+            print(f"\033[33mNo C/C++ lines changed since {args.diff_base}.\033[0m")
+            return
+
+        print(f"\033[33mFormatting changed lines of {len(file_ranges)} files:\033[0m")
+        formatted, failed = format_ranges(
+            file_ranges, args.clang_format, args.style, max(1, args.jobs)
+        )
+        if failed:
+            print(f"\033[31mFailed to format {failed} files.\033[0m")
+        print(f"\033[32mFormatting complete ({formatted} files)!\033[0m")
+        return
+
+    jobs = max(1, args.jobs)
+    if args.cache:
+        # The cache compares size and mtime, which the walk already has
+        stats = dict(
+            find_source_files(args.root_dir, args.ignore, jobs, with_stat=True)
+        )
+        source_files = list(stats)
+    else:
+        stats = None
+        source_files = find_source_files(args.root_dir, args.ignore, jobs)
 
     if not source_files:
         print("\033[33mNo C/C++ files found to format.\033[0m")
         return
 
     print(f"\033[33mFound {len(source_files)} files to format:\033[0m")
-    format_files(source_files, args.clang_format, args.style)
-    print(f"\033[32mFormatting complete ({count} files)!\033[0m")
+    cache = (
+        FormatCache(args.cache, args.clang_format, args.style) if args.cache else None
+    )
+    formatted, failed = format_files(
+        source_files, args.clang_format, args.style, jobs, cache, stats
+    )
+    if cache is not None:
+        cache.prune(source_files)
+        cache.save()
+        skipped = len(source_files) - formatted - failed
+        print(f"\033[33mSkipped {skipped} unchanged files.\033[0m")
+    if failed:
+        print(f"\033[31mFailed to format {failed} files.\033[0m")
+    print(f"\033[32mFormatting complete ({formatted} files)!\033[0m")
 
 
 if __name__ == "__main__":
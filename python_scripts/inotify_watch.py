@@ -0,0 +1,139 @@
+"""Minimal inotify bindings (Linux only) built on ctypes."""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+from collections.abc import Iterable
+from typing import NamedTuple
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class Event(NamedTuple):
+    path: str
+    mask: int
+    cookie: int
+
+
+class Inotify:
+    """A non-blocking inotify instance with optional recursive watches."""
+
+    def __init__(self) -> None:
+        self._libc = ctypes.CDLL(
+            ctypes.util.find_library("c") or "libc.so.6", use_errno=True
+        )
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+        self.paths: dict[int, str] = {}
+        self._tree_mask = 0
+        self._ignored: tuple[str, ...] = ()
+
+    def __enter__(self) -> "Inotify":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def add_watch(self, path: str, mask: int) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code), path)
+        self.paths[wd] = path
+        return wd
+
+    def add_tree(self, root: str, mask: int, ignored: Iterable[str] = ()) -> None:
+        """Watch ``root`` and every directory below it, skipping directories
+        named in ``ignored``. Directories created later are watched too."""
+        self._tree_mask = mask | IN_CREATE | IN_MOVED_TO | IN_ONLYDIR
+        self._ignored = tuple(ignored)
+        for dirpath, dirnames, _ in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d not in self._ignored]
+            try:
+                self.add_watch(dirpath, self._tree_mask)
+            except OSError as e:
+                # Directories may vanish between walking and watching
+                if e.errno != errno.ENOENT:
+                    raise
+
+    def read(self, timeout: float | None = None) -> list[Event]:
+        """Return pending events, waiting at most ``timeout`` seconds."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+                offset += length
+
+                directory = self.paths.get(wd, "")
+                if mask & IN_IGNORED:
+                    self.paths.pop(wd, None)
+                    continue
+                path = os.path.join(directory, name) if name else directory
+                if (
+                    self._tree_mask
+                    and mask & IN_ISDIR
+                    and mask & (IN_CREATE | IN_MOVED_TO)
+                    and name not in self._ignored
+                ):
+                    self.add_tree(path, self._tree_mask, self._ignored)
+                events.append(Event(path, mask, cookie))
+        return events
+
+    def read_batch(
+        self, debounce: float, timeout: float | None = None, max_wait: float = 2.0
+    ) -> list[Event]:
+        """Wait for events, then keep collecting until ``debounce`` seconds
+        pass without a new one, so a burst of writes arrives as one batch.
+        Under a steady stream of events the batch is returned at the latest
+        ``max_wait`` seconds after its first event."""
+        events = self.read(timeout)
+        if not events:
+            return events
+
+        cutoff = time.monotonic() + max_wait
+        deadline = min(time.monotonic() + debounce, cutoff)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return events
+            more = self.read(remaining)
+            if more:
+                events += more
+                deadline = min(time.monotonic() + debounce, cutoff)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The scripts are run directly and import their sibling modules by name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
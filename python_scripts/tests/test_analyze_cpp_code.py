@@ -0,0 +1,130 @@
+import json
+import os
+import subprocess
+
+from analyze_cpp_code import ClangTidyRunner, CppAnalyzer, IncludeGraph
+
+
+def git(repo, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=repo,
+        check=True,
+        capture_output=True,
+    )
+
+
+def make_repo(tmp_path):
+    (tmp_path / "include").mkdir()
+    (tmp_path / "a.cpp").write_text('#include "b.h"\nint main() { return b(); }\n')
+    (tmp_path / "c.cpp").write_text('#include "d.h"\nint c() { return 0; }\n')
+    (tmp_path / "b.h").write_text("int b();\n")
+    (tmp_path / "include" / "d.h").write_text("int d();\n")
+    git(tmp_path, "init", "-q")
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-q", "-m", "initial")
+    return tmp_path
+
+
+def install_clang_tidy(tmp_path, monkeypatch, script):
+    """Put a stub clang-tidy running the shell ``script`` first on PATH."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    stub = bin_dir / "clang-tidy"
+    stub.write_text(f"#!/bin/sh\n{script}\n")
+    stub.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+
+def test_dependents_of_deleted_header(tmp_path):
+    repo = make_repo(tmp_path)
+    a_cpp, b_h = str(repo / "a.cpp"), str(repo / "b.h")
+    graph = IncludeGraph(str(repo))
+    graph.update([a_cpp, b_h])
+    assert graph.dependents({b_h}) == {a_cpp}
+
+    os.remove(b_h)
+    graph.update([b_h])
+    assert graph.unresolved_includes(a_cpp) == ["b.h"]
+    assert graph.dependents({b_h}) == {a_cpp}
+
+
+def test_dependents_of_deleted_header_in_include_dir(tmp_path):
+    repo = make_repo(tmp_path)
+    c_cpp, d_h = str(repo / "c.cpp"), str(repo / "include" / "d.h")
+    os.remove(d_h)
+    graph = IncludeGraph(str(repo), [str(repo / "include")])
+    graph.update([c_cpp])
+    assert graph.dependents({d_h}) == {c_cpp}
+
+
+def test_changed_since_selects_includers_of_deleted_header(tmp_path, monkeypatch):
+    repo = make_repo(tmp_path)
+    monkeypatch.chdir(repo)
+    os.remove(repo / "b.h")
+
+    analyzer = CppAnalyzer(str(repo), changed_since="HEAD")
+    all_files = sorted(analyzer.iter_cpp_files())
+    assert analyzer.select_changed_files(all_files) == [str(repo / "a.cpp")]
+
+
+def test_changed_since_selects_includers_of_renamed_header(tmp_path, monkeypatch):
+    repo = make_repo(tmp_path)
+    monkeypatch.chdir(repo)
+    git(repo, "mv", "b.h", "e.h")
+
+    analyzer = CppAnalyzer(str(repo), changed_since="HEAD")
+    all_files = sorted(analyzer.iter_cpp_files())
+    assert analyzer.select_changed_files(all_files) == [
+        str(repo / "a.cpp"),
+        str(repo / "e.h"),
+    ]
+
+
+def test_clang_tidy_timeout(tmp_path, monkeypatch):
+    install_clang_tidy(tmp_path, monkeypatch, "exec sleep 10")
+    runner = ClangTidyRunner(timeout=0.2)
+    assert runner.run("a.cpp") == ("", "clang-tidy timed out after 0.2s")
+
+
+def test_clang_tidy_failure_without_diagnostics_is_an_error(tmp_path, monkeypatch):
+    install_clang_tidy(tmp_path, monkeypatch, "echo 'no such file' >&2; exit 1")
+    output, error = ClangTidyRunner().run("a.cpp")
+    assert output == "no such file\n"
+    assert error == "clang-tidy exited with status 1"
+
+
+def test_clang_tidy_failure_with_diagnostics_is_not_an_error(tmp_path, monkeypatch):
+    install_clang_tidy(tmp_path, monkeypatch, "echo 'a.cpp:1:2: error: boom'; exit 1")
+    assert ClangTidyRunner().run("a.cpp") == ("a.cpp:1:2: error: boom\n", None)
+
+
+def test_clang_tidy_uses_compile_commands(tmp_path, monkeypatch):
+    install_clang_tidy(tmp_path, monkeypatch, 'echo "$@"')
+    build = tmp_path / "build"
+    build.mkdir()
+    (build / "compile_commands.json").write_text(
+        json.dumps([{"directory": str(tmp_path), "file": "a.cpp", "command": "c++"}])
+    )
+    a_cpp, b_cpp, b_h = (str(tmp_path / name) for name in ("a.cpp", "b.cpp", "b.h"))
+
+    runner = ClangTidyRunner(str(build / "compile_commands.json"))
+    assert runner.run(a_cpp) == (f"-p {build} {a_cpp}\n", None)
+    assert runner.run(b_cpp) == (f"{b_cpp} --\n", None)
+    # Headers outside the database are checked through their includers
+    assert runner.command(b_h) is None
+    assert runner.run(b_h) == ("", None)
+    assert ClangTidyRunner().command(b_h) == ["clang-tidy", b_h, "--"]
+
+
+def test_clang_tidy_dedupes_header_diagnostics():
+    runner = ClangTidyRunner()
+    header_warning = "b.h:1:5: warning: header issue [check]"
+    assert runner.dedupe(
+        "a.cpp", ["a.cpp:2:1: warning: own issue [check]", header_warning]
+    ) == ["a.cpp:2:1: warning: own issue [check]", header_warning]
+    assert runner.dedupe(
+        "c.cpp", ["c.cpp:2:1: warning: own issue [check]", header_warning]
+    ) == ["c.cpp:2:1: warning: own issue [check]"]
+    # A header's own diagnostics are never dropped
+    assert runner.dedupe("b.h", [header_warning]) == [header_warning]
@@ -0,0 +1,228 @@
+"""Fast directory walker shared by the formatter and analyzer scripts.
+
+Ignored directories are pruned before they are entered, ``.gitignore``
+files are honoured on the way down and wide trees can be scanned by
+several threads at once. The helpers the scripts need for the files they
+find live here too: command line batching and content digests.
+"""
+
+import hashlib
+import os
+import re
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+# Bytes of file arguments per tool run, well below ARG_MAX
+MAX_ARGV_BYTES = 100_000
+
+
+class IgnoreRule(NamedTuple):
+    base: str  # Directory of the .gitignore the rule comes from
+    pattern: re.Pattern
+    negate: bool
+    dir_only: bool
+
+
+def translate_pattern(pattern: str) -> str:
+    """Translate a gitignore glob into a regular expression body."""
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2 :]:
+            end = pattern.index("]", i + 2)
+            chars = pattern[i + 1 : end].replace("\\", "\\\\")
+            if chars.startswith("!"):
+                chars = "^" + chars[1:]
+            parts.append(f"[{chars}]")
+            i = end + 1
+        elif pattern[i] == "\\" and i + 1 < len(pattern):
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(parts)
+
+
+def read_gitignore(directory: str) -> list[IgnoreRule]:
+    rules = []
+    try:
+        with open(os.path.join(directory, ".gitignore"), errors="replace") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return rules
+
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        # Patterns with an inner slash are relative to the .gitignore,
+        # others match a name at any depth below it
+        anchored = "/" in line
+        body = translate_pattern(line.lstrip("/"))
+        regex = body if anchored else f"(?:.*/)?{body}"
+        rules.append(IgnoreRule(directory, re.compile(f"{regex}$"), negate, dir_only))
+    return rules
+
+
+def is_ignored(rules: list[IgnoreRule], path: str, is_dir: bool) -> bool:
+    """Apply rules like git does: the last matching rule decides."""
+    ignored = False
+    for rule in rules:
+        if rule.dir_only and not is_dir:
+            continue
+        relative = path[len(rule.base) :].lstrip("/")
+        if rule.pattern.match(relative):
+            ignored = not rule.negate
+    return ignored
+
+
+def scan_directory(
+    path: str,
+    rules: list[IgnoreRule],
+    ignored_dirs: frozenset[str],
+    extensions: tuple[str, ...] | None,
+    gitignore: bool,
+    with_stat: bool,
+) -> tuple[list[tuple[str, os.stat_result | None]], list[str], list[IgnoreRule]]:
+    """Return the wanted files and the subdirectories to descend into, both
+    sorted by name, plus the ignore rules in effect below ``path``."""
+    try:
+        with os.scandir(path) as iterator:
+            entries = sorted(iterator, key=lambda entry: entry.name)
+    except OSError:
+        return [], [], rules
+
+    if gitignore and any(entry.name == ".gitignore" for entry in entries):
+        rules = rules + read_gitignore(path)
+
+    files = []
+    directories = []
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir()
+            if is_dir:
+                # Like os.walk, symlinked directories are not followed
+                if (
+                    entry.name in ignored_dirs
+                    or (gitignore and entry.name == ".git")
+                    or entry.is_symlink()
+                    or (rules and is_ignored(rules, entry.path, True))
+                ):
+                    continue
+                directories.append(entry.path)
+            elif extensions is None or entry.name.endswith(extensions):
+                if rules and is_ignored(rules, entry.path, False):
+                    continue
+                files.append((entry.path, entry.stat() if with_stat else None))
+        except OSError:
+            continue
+    return files, directories, rules
+
+
+def walk_files(
+    root: str,
+    ignored_dirs: Iterable[str] = (),
+    extensions: tuple[str, ...] | None = None,
+    gitignore: bool = True,
+    with_stat: bool = False,
+    jobs: int = 1,
+) -> Iterator[str] | Iterator[tuple[str, os.stat_result]]:
+    """Yield files below ``root`` in the order of a sorted, top-down
+    ``os.walk``.
+
+    Directories named in ``ignored_dirs``, ``.git`` and anything matched by
+    a ``.gitignore`` (unless ``gitignore`` is False) are never entered.
+    Only files ending in one of ``extensions`` are yielded, as
+    ``(path, stat)`` when ``with_stat`` is set. With ``jobs`` > 1 each
+    level of the tree is scanned by a thread pool before files are
+    yielded, which pays off on wide trees and slow file systems.
+    """
+    ignored = frozenset(ignored_dirs)
+
+    def scan(
+        path: str, rules: list[IgnoreRule]
+    ) -> tuple[list[tuple[str, os.stat_result | None]], list[str], list[IgnoreRule]]:
+        return scan_directory(path, rules, ignored, extensions, gitignore, with_stat)
+
+    def emit(
+        files: list[tuple[str, os.stat_result | None]],
+    ) -> Iterator[str] | Iterator[tuple[str, os.stat_result]]:
+        if with_stat:
+            yield from files
+        else:
+            yield from (path for path, _ in files)
+
+    if jobs <= 1:
+        stack: list[tuple[str, list[IgnoreRule]]] = [(root, [])]
+        while stack:
+            files, directories, rules = scan(*stack.pop())
+            yield from emit(files)
+            stack.extend((directory, rules) for directory in reversed(directories))
+        return
+
+    scanned = {}
+    level: list[tuple[str, list[IgnoreRule]]] = [(root, [])]
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while level:
+            results = list(executor.map(lambda item: scan(*item), level))
+            next_level = []
+            for (path, _), (files, directories, rules) in zip(level, results):
+                scanned[path] = (files, directories)
+                next_level += [(directory, rules) for directory in directories]
+            level = next_level
+
+    pending = [root]
+    while pending:
+        files, directories = scanned[pending.pop()]
+        yield from emit(files)
+        pending.extend(reversed(directories))
+
+
+def argv_batches(
+    arguments: Iterable[str],
+    max_args: int | None = None,
+    max_bytes: int = MAX_ARGV_BYTES,
+) -> Iterator[list[str]]:
+    """Split ``arguments`` into batches that fit on one command line, each
+    also at most ``max_args`` long when given."""
+    batch: list[str] = []
+    size = 0
+    for argument in arguments:
+        length = len(os.fsencode(argument)) + 1
+        if batch and (len(batch) == max_args or size + length > max_bytes):
+            yield batch
+            batch, size = [], 0
+        batch.append(argument)
+        size += length
+    if batch:
+        yield batch
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's content, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()